@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for statusline.py
+
+Usage:
+    ./benchmark.py startup [--target-ms 15] [--budget-ms 35]
+    ./benchmark.py run [--only usage,git,pr,width,main] [--json results.json]
+                       [--baseline PATH] [--update-baseline]
+    ./benchmark.py gen-transcripts DIR [--files 50 --lines 2000 ...]
+    ./benchmark.py gen-repo DIR [--files 2000 --dirty 200 --diff-lines 500]
+
+startup: real `statusline.py < payload` runs answered from the output cache,
+i.e. interpreter start, imports and a few stat() calls without any data
+collection. Checks the run answered by the daemon against a target and the
+in-process run against a budget, in milliseconds, and shows bare interpreter
+start and the slowest imports (from `python -X importtime`). Exits with
+status 1 if either is exceeded.
+
+run: generates a synthetic ~/.claude/projects tree, a git repository with
+dirty files and a fake `gh` with configurable latency in a scratch
+directory, then times analyze_usage_data(), get_git_info(), get_pr_data(),
+visible_len() and end-to-end statusline runs at cold and warm cache. The
+median of every benchmark is compared with the stored baseline; exits with
+status 1 if one regressed by more than the tolerance.
+
+gen-transcripts, gen-repo: only generate the data, for profiling by hand.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# A full `python3 statusline.py` run answered from the output cache, with
+# the bytecode of statusline_core cached as installed Pythons do: the fixed
+# cost of every render. Through the daemon the client only starts the
+# interpreter and forwards the payload, which meets the 15 ms target; in
+# process, importing statusline_core adds ~15 ms on top, so that run gets its
+# own budget, set just above where this tree is to catch regressions.
+STARTUP_TARGET_MS = 15.0
+STARTUP_BUDGET_MS = 35.0
+
+# Stored results of `run --update-baseline`; machine specific, not committed.
+BASELINE_FILE = os.path.join(REPO_DIR, '.benchmark-baseline.json')
+
+# A benchmark regresses when its median exceeds the baseline median by more
+# than the tolerance and by more than REGRESSION_FLOOR_MS (timer noise on
+# sub-millisecond benchmarks).
+REGRESSION_TOLERANCE = 0.25
+REGRESSION_FLOOR_MS = 1.0
+
+BENCHMARKS = ('usage', 'git', 'pr', 'width', 'main')
+
+# Models spread over the synthetic usage lines, one per pricing tier.
+TRANSCRIPT_MODELS = ('claude-sonnet-4-5-20250929', 'claude-opus-4-1-20250805', 'claude-haiku-4-5-20251001')
+
+# Transcript files per synthetic project directory.
+FILES_PER_PROJECT = 5
+
+# Rendered segments visible_len() sees: colors, emoji, CJK, box drawing.
+WIDTH_SAMPLES = (
+    '\x1b[1;36mSonnet 4.5\x1b[0m',
+    '\x1b[32m🌿 feature/benchmark-suite\x1b[0m \x1b[33m+12 ~3 -1\x1b[0m',
+    '🧠 \x1b[32m▰▰▰▰▱▱▱▱\x1b[0m 48%',
+    '💰 $12.34/$40.00 · ⏱ 2h 13m',
+    'PR#123: 修复状态栏宽度计算',
+    '📅 24h 1.2M $45.10 · 7d 8.9M $310.22',
+    '\x1b[2m│\x1b[0m plain ascii segment of moderate length',
+)
+WIDTH_CALLS = 10000
+
+# Default Claude Code payload for end-to-end runs.
+PAYLOAD = {
+    'model': {'display_name': 'Sonnet 4.5'},
+    'context_window': {'used_percentage': 42},
+    'workspace': {},
+}
+
+
+def best_wall_time(cmd, runs, stdin=None, env=None):
+    """Fastest of runs wall-clock times of cmd, in milliseconds."""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, input=stdin, env=env, cwd=REPO_DIR,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def import_times(module, runs):
+    """Per-module import times of `import module` as {name: (self_us, cumulative_us)}.
+
+    Keeps the fastest of runs for every module.
+    """
+    times = {}
+    # Let the first run write the bytecode cache that the others then use.
+    env = {k: v for k, v in os.environ.items() if k != 'PYTHONDONTWRITEBYTECODE'}
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=REPO_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            name = name.strip()
+            entry = (int(self_us), int(cumulative_us))
+            if name not in times or entry[1] < times[name][1]:
+                times[name] = entry
+    return times
+
+
+def bench_startup(args):
+    """Real statusline runs on an output-cache hit, against target and budget.
+
+    Uses a scratch config and cache directory, so the only data collected
+    (by the warm-up run) is git status of this repository.
+    """
+    work = tempfile.mkdtemp(prefix='statusline-startup-')
+    cache_dir = os.path.join(work, 'cache')
+    socket_path = os.path.join(work, 'daemon.sock')
+    os.makedirs(os.path.join(work, '.claude'))
+    # Let the warm-up run write the bytecode cache that the others then use.
+    env = {k: v for k, v in os.environ.items()
+           if k != 'PYTHONDONTWRITEBYTECODE' and not k.startswith('CLAUDE_STATUSLINE_')}
+    env.update({
+        'HOME': work,
+        'CLAUDE_CONFIG_DIR': os.path.join(work, '.claude'),
+        'CLAUDE_STATUSLINE_CACHE_DIR': cache_dir,
+        'CLAUDE_STATUSLINE_SOCKET': socket_path,
+        'COLUMNS': '160',
+    })
+    raw = json.dumps(dict(PAYLOAD, workspace={'current_dir': REPO_DIR})).encode('utf-8')
+    script = [sys.executable, os.path.join(REPO_DIR, 'statusline.py')]
+    daemon = None
+    try:
+        interpreter_ms = best_wall_time([sys.executable, '-c', 'pass'], args.runs, env=env)
+        # The first run may miss its deadline and finish in the background;
+        # the second then renders completely and fills the output cache.
+        for _ in range(2):
+            best_wall_time(script, 1, raw, env)
+            wait_for_refresh(cache_dir)
+        hit_ms = best_wall_time(script, args.runs, raw, env)
+
+        daemon = subprocess.Popen(script + ['--daemon'], env=env, cwd=REPO_DIR,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        end = time.monotonic() + 10
+        while not os.path.exists(socket_path) and time.monotonic() < end:
+            time.sleep(0.01)
+        best_wall_time(script, 1, raw, env)
+        daemon_ms = best_wall_time(script, args.runs, raw, env)
+    finally:
+        if daemon is not None:
+            daemon.terminate()
+            daemon.wait()
+        shutil.rmtree(work, ignore_errors=True)
+    times = import_times('statusline_core', args.runs)
+
+    print(f"interpreter      {interpreter_ms:7.1f} ms")
+    print(f"daemon           {daemon_ms:7.1f} ms (target {args.target_ms:.1f} ms)")
+    print(f"in-process       {hit_ms:7.1f} ms (budget {args.budget_ms:.1f} ms)")
+    print(f"  import statusline_core {times['statusline_core'][1] / 1000:6.1f} ms")
+    slowest = sorted((t for t in times.items() if t[0] not in ('statusline', 'statusline_core')), key=lambda t: -t[1][0])[:args.top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"  {name:<30} {self_us / 1000:6.1f} ms self, {cumulative_us / 1000:6.1f} ms cumulative")
+    return daemon_ms <= args.target_ms and hit_ms <= args.budget_ms
+
+
+def iso_timestamp(epoch):
+    """Transcript-style UTC timestamp with milliseconds."""
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def transcript_line(rng, ts, usage, line_bytes):
+    """One JSONL transcript line of roughly line_bytes bytes, laid out like Claude Code's."""
+    if usage:
+        record = {
+            'type': 'assistant',
+            'message': {
+                'model': rng.choice(TRANSCRIPT_MODELS),
+                'role': 'assistant',
+                'content': [{'type': 'text', 'text': ''}],
+                'usage': {
+                    'input_tokens': rng.randint(1, 5000),
+                    'output_tokens': rng.randint(1, 4000),
+                    'cache_creation_input_tokens': rng.randint(0, 20000),
+                    'cache_read_input_tokens': rng.randint(0, 200000),
+                },
+            },
+            'timestamp': iso_timestamp(ts),
+        }
+        text = record['message']['content'][0]
+    else:
+        record = {'type': 'user', 'message': {'role': 'user', 'content': ''}, 'timestamp': iso_timestamp(ts)}
+        text = record['message']
+    key = 'text' if usage else 'content'
+    padding = line_bytes - len(json.dumps(record, separators=(',', ':')))
+    text[key] = 'x' * max(padding, 0)
+    return json.dumps(record, separators=(',', ':'))
+
+
+def generate_transcripts(root, files=50, lines=2000, line_bytes=600, usage_share=0.4, days=30, seed=0):
+    """Write a synthetic Claude data tree under root; returns its projects directory.
+
+    files transcripts of lines lines each (about line_bytes bytes per line,
+    usage_share of them with token usage) spread over FILES_PER_PROJECT-file
+    project directories. Each transcript covers a few hours starting at a
+    random point of the last days days; the last one ends now, so an open
+    session exists.
+    """
+    rng = random.Random(seed)
+    projects = os.path.join(root, '.claude', 'projects')
+    now = time.time()
+    for i in range(files):
+        project = os.path.join(projects, f'-bench-project-{i // FILES_PER_PROJECT}')
+        os.makedirs(project, exist_ok=True)
+        span = rng.uniform(600, 4 * 3600)
+        start = now - span if i == files - 1 else now - rng.uniform(span, max(days * 86400, span))
+        step = span / max(lines, 1)
+        with open(os.path.join(project, f'{i:08x}-bench.jsonl'), 'w', encoding='utf-8') as f:
+            for n in range(lines):
+                f.write(transcript_line(rng, start + n * step, rng.random() < usage_share, line_bytes))
+                f.write('\n')
+    return projects
+
+
+def git(repo, *args):
+    """Run a git command in repo, quietly, with a fixed identity."""
+    subprocess.run(
+        ['git', '-c', 'user.name=bench', '-c', 'user.email=bench@example.invalid', *args],
+        cwd=repo, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def generate_repo(repo, files=2000, dirty=200, diff_lines=500, seed=0):
+    """Create a git repository with files committed files, dirty of them modified.
+
+    Every dirty file gets diff_lines changed lines, half rewritten and half
+    appended. The branch tracks origin so the remote is shown.
+    """
+    rng = random.Random(seed)
+    os.makedirs(repo, exist_ok=True)
+    git(repo, 'init', '-q', '-b', 'bench/large-diff')
+    paths = []
+    for i in range(files):
+        path = os.path.join(f'dir{i // 100:03d}', f'file{i:05d}.txt')
+        os.makedirs(os.path.join(repo, os.path.dirname(path)), exist_ok=True)
+        with open(os.path.join(repo, path), 'w', encoding='utf-8') as f:
+            f.writelines(f'line {n} of {path}\n' for n in range(max(diff_lines // 2, 20)))
+        paths.append(path)
+    git(repo, 'add', '-A')
+    git(repo, 'commit', '-q', '-m', 'Initial benchmark tree')
+    git(repo, 'remote', 'add', 'origin', 'https://example.invalid/bench.git')
+    git(repo, 'config', 'branch.bench/large-diff.remote', 'origin')
+    git(repo, 'config', 'branch.bench/large-diff.merge', 'refs/heads/bench/large-diff')
+
+    for path in rng.sample(paths, min(dirty, files)):
+        full = os.path.join(repo, path)
+        with open(full, encoding='utf-8') as f:
+            content = f.readlines()
+        rewritten = min(diff_lines // 2, len(content))
+        content[:rewritten] = [f'changed {rng.random()}\n' for _ in range(rewritten)]
+        content += [f'added {rng.random()}\n' for _ in range(diff_lines - rewritten)]
+        with open(full, 'w', encoding='utf-8') as f:
+            f.writelines(content)
+    return repo
+
+
+def write_fake_gh(bin_dir, latency_ms):
+    """Put a `gh` on bin_dir that answers `gh pr view` after latency_ms."""
+    os.makedirs(bin_dir, exist_ok=True)
+    path = os.path.join(bin_dir, 'gh')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('#!/bin/sh\n')
+        f.write(f'sleep {latency_ms / 1000:.3f}\n')
+        f.write('echo \'{"number": 4242, "title": "Benchmark: large diff with a fairly long PR title"}\'\n')
+    os.chmod(path, 0o755)
+    return path
+
+
+def summarize(samples_ms, **extra):
+    """Result record for a list of timings in milliseconds."""
+    return {
+        'median_ms': round(statistics.median(samples_ms), 3),
+        'min_ms': round(min(samples_ms), 3),
+        'max_ms': round(max(samples_ms), 3),
+        'runs': len(samples_ms),
+        **extra,
+    }
+
+
+def fresh_statusline(cache_dir, clear):
+    """statusline reloaded with empty in-memory caches, optionally also on disk."""
+    if clear:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    os.environ['CLAUDE_STATUSLINE_CACHE_DIR'] = cache_dir
+    import statusline_core
+    return importlib.reload(statusline_core)
+
+
+def timed(fn, *args):
+    """Wall-clock time of fn(*args) in milliseconds."""
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def bench_in_process(name, runs, cache_dir, call):
+    """Cold (no caches) and warm (caches on disk, fresh process state) timings of call(module)."""
+    results = {}
+    for state in ('cold', 'warm'):
+        samples = []
+        for _ in range(runs):
+            module = fresh_statusline(cache_dir, clear=state == 'cold')
+            if state == 'warm' and not samples:
+                call(module)
+                module = fresh_statusline(cache_dir, clear=False)
+            samples.append(timed(call, module))
+        results[f'{name}.{state}'] = summarize(samples)
+    return results
+
+
+def bench_usage(env, runs):
+    """analyze_usage_data() over the synthetic transcripts."""
+    return bench_in_process('usage', runs, os.path.join(env['work'], 'cache-usage'),
+                            lambda m: m.analyze_usage_data())
+
+
+def bench_git(env, runs):
+    """get_git_info() on the generated repository."""
+    return bench_in_process('git', runs, os.path.join(env['work'], 'cache-git'),
+                            lambda m: m.get_git_info(env['repo']))
+
+
+def bench_pr(env, runs):
+    """get_pr_data() as the refresh process runs it, against the fake gh."""
+    def call(module):
+        module._background = True
+        job = module.CollectorJob('git', module.collect_git_status, (env['repo'],))
+        module.get_pr_data(env['repo'], job)
+    return bench_in_process('pr', runs, os.path.join(env['work'], 'cache-pr'), call)
+
+
+def bench_width(env, runs):
+    """visible_len() over typical rendered segments, memoized and not."""
+    import statusline_core
+    samples = [WIDTH_SAMPLES[i % len(WIDTH_SAMPLES)] for i in range(WIDTH_CALLS)]
+    results = {}
+    visible_len = statusline_core.visible_len
+    for name, fn in (('visible_len', visible_len),
+                     ('visible_len_uncached', getattr(visible_len, '__wrapped__', visible_len))):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            for s in samples:
+                fn(s)
+            times.append((time.perf_counter() - start) * 1000)
+        results[f'width.{name}'] = summarize(times, calls=WIDTH_CALLS)
+    return results
+
+
+def wait_for_refresh(cache_dir, timeout=30):
+    """Wait until detached refresh processes started by a render are done."""
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        try:
+            if not any(name.startswith('refresh-') for name in os.listdir(cache_dir)):
+                return
+        except OSError:
+            return
+        time.sleep(0.01)
+
+
+def bench_main(env, runs):
+    """End-to-end `statusline.py < payload` runs, including interpreter start."""
+    payload = dict(PAYLOAD, workspace={'current_dir': env['repo']})
+    raw = json.dumps(payload).encode('utf-8')
+    script = os.path.join(REPO_DIR, 'statusline.py')
+
+    def run(cache_dir):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script], input=raw, cwd=env['repo'], check=True,
+                       stdout=subprocess.DEVNULL, env=dict(os.environ, CLAUDE_STATUSLINE_CACHE_DIR=cache_dir))
+        elapsed = (time.perf_counter() - start) * 1000
+        wait_for_refresh(cache_dir)
+        return elapsed
+
+    cold = []
+    for i in range(runs):
+        cold.append(run(os.path.join(env['work'], f'cache-main-cold-{i}')))
+    warm_dir = os.path.join(env['work'], 'cache-main-warm')
+    run(warm_dir)
+    warm = [run(warm_dir) for _ in range(runs)]
+    return {'main.cold': summarize(cold), 'main.warm': summarize(warm)}
+
+
+def prepare_env(args):
+    """Generate the benchmark data and point statusline at it through the environment."""
+    work = args.workdir or tempfile.mkdtemp(prefix='statusline-bench-')
+    env = {'work': work, 'repo': os.path.join(work, 'repo')}
+    start = time.perf_counter()
+    if not os.path.isdir(os.path.join(work, '.claude')):
+        generate_transcripts(work, args.files, args.lines, args.line_bytes, args.usage_share, args.days, args.seed)
+    if not os.path.isdir(env['repo']):
+        generate_repo(env['repo'], args.repo_files, args.dirty, args.diff_lines, args.seed)
+    bin_dir = os.path.join(work, 'bin')
+    write_fake_gh(bin_dir, args.gh_latency_ms)
+    print(f"data in {work} ({time.perf_counter() - start:.1f}s to prepare)")
+
+    os.environ.update({
+        'HOME': work,
+        'CLAUDE_CONFIG_DIR': os.path.join(work, '.claude'),
+        'CLAUDE_STATUSLINE_SOCKET': os.path.join(work, 'no-daemon.sock'),
+        'CLAUDE_STATUSLINE_DEADLINE_MS': str(args.deadline_ms),
+        'PATH': bin_dir + os.pathsep + os.environ.get('PATH', ''),
+        'COLUMNS': '160',
+    })
+    for name in ('XDG_CACHE_HOME', 'XDG_RUNTIME_DIR', 'CLAUDE_CODE_EFFORT_LEVEL'):
+        os.environ.pop(name, None)
+    sys.path.insert(0, REPO_DIR)
+    return env
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Names of benchmarks whose median regressed past the baseline."""
+    regressed = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        median, base_median = result['median_ms'], base['median_ms']
+        if median > base_median * (1 + tolerance) and median - base_median > REGRESSION_FLOOR_MS:
+            regressed.append(name)
+    return regressed
+
+
+def bench_run(args):
+    """Run the benchmark suite, report, and check against the baseline."""
+    selected = args.only.split(',') if args.only else BENCHMARKS
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        sys.exit(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    env = prepare_env(args)
+    runners = {'usage': bench_usage, 'git': bench_git, 'pr': bench_pr, 'width': bench_width, 'main': bench_main}
+    results = {}
+    try:
+        for name in selected:
+            results.update(runners[name](env, args.runs))
+    finally:
+        if not args.workdir and not args.keep:
+            shutil.rmtree(env['work'], ignore_errors=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+    regressed = compare_with_baseline(results, baseline, args.tolerance)
+
+    for name, result in results.items():
+        base = baseline.get(name)
+        change = f"{(result['median_ms'] / base['median_ms'] - 1) * 100:+6.1f}%" if base and base['median_ms'] else ''
+        flag = '  REGRESSED' if name in regressed else ''
+        print(f"{name:<28} {result['median_ms']:9.2f} ms median {result['min_ms']:9.2f} ms min {change}{flag}")
+
+    report = {
+        'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {k: v for k, v in vars(args).items() if k not in ('benchmark', 'json', 'baseline', 'update_baseline')},
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return True
+    if regressed:
+        print(f"{len(regressed)} benchmark(s) regressed more than {args.tolerance:.0%} against {args.baseline}")
+    return not regressed
+
+
+def add_transcript_args(parser):
+    parser.add_argument('--files', type=int, default=50, help="transcript files")
+    parser.add_argument('--lines', type=int, default=2000, help="lines per transcript")
+    parser.add_argument('--line-bytes', type=int, default=600, help="approximate bytes per line")
+    parser.add_argument('--usage-share', type=float, default=0.4, help="share of lines with token usage")
+    parser.add_argument('--days', type=float, default=30, help="spread transcripts over this many days")
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def add_repo_args(parser, prefix=''):
+    parser.add_argument(f'--{prefix}files', dest=f"{prefix.replace('-', '_')}files", type=int, default=2000,
+                        help="files in the generated repository")
+    parser.add_argument('--dirty', type=int, default=200, help="modified files")
+    parser.add_argument('--diff-lines', type=int, default=500, help="changed lines per modified file")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for statusline.py")
+    sub = parser.add_subparsers(dest='benchmark', required=True)
+    startup = sub.add_parser('startup', help="statusline runs on an output-cache hit")
+    startup.add_argument('--target-ms', type=float, default=STARTUP_TARGET_MS, help="through the daemon")
+    startup.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS, help="without the daemon")
+    startup.add_argument('--runs', type=int, default=10, help="keep the fastest of this many runs")
+    startup.add_argument('--top', type=int, default=10, help="list the slowest imports")
+
+    run = sub.add_parser('run', help="collector and end-to-end benchmarks on generated data")
+    run.add_argument('--only', help=f"comma-separated subset of {','.join(BENCHMARKS)}")
+    run.add_argument('--runs', type=int, default=5, help="timed runs per benchmark")
+    add_transcript_args(run)
+    add_repo_args(run, prefix='repo-')
+    run.add_argument('--gh-latency-ms', type=float, default=200, help="latency of the fake gh")
+    run.add_argument('--deadline-ms', type=int, default=10000,
+                     help="collection deadline of end-to-end runs (high: measure the full work)")
+    run.add_argument('--workdir', help="generate into (and reuse) this directory instead of a temporary one")
+    run.add_argument('--keep', action='store_true', help="keep the temporary directory")
+    run.add_argument('--json', help="also write the results to this file")
+    run.add_argument('--baseline', default=BASELINE_FILE)
+    run.add_argument('--update-baseline', action='store_true', help="store these results as the baseline")
+    run.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                     help="allowed slowdown of the median against the baseline")
+
+    transcripts = sub.add_parser('gen-transcripts', help="generate a synthetic Claude data tree")
+    transcripts.add_argument('dir')
+    add_transcript_args(transcripts)
+
+    repo = sub.add_parser('gen-repo', help="generate a git repository with dirty files")
+    repo.add_argument('dir')
+    add_repo_args(repo)
+    repo.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.benchmark == 'startup':
+        ok = bench_startup(args)
+    elif args.benchmark == 'run':
+        ok = bench_run(args)
+    elif args.benchmark == 'gen-transcripts':
+        print(generate_transcripts(args.dir, args.files, args.lines, args.line_bytes,
+                                   args.usage_share, args.days, args.seed))
+        ok = True
+    else:
+        print(generate_repo(args.dir, args.files, args.dirty, args.diff_lines, args.seed))
+        ok = True
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
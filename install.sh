@@ -97,7 +97,7 @@ echo ""
 echo "📝 Next steps:"
 echo "   1. Restart Claude Code for changes to take effect"
 echo "   2. (Optional) Install gh CLI for PR info: sudo apt install gh"
-echo "   3. (Optional) Customize limits in statusline.py (lines 212-213)"
+echo "   3. (Optional) Customize the layout in statusline_core.py"
 echo ""
 echo "📖 Documentation: $SCRIPT_DIR/README.md"
 echo "🐛 Issues: https://github.com/haraldschilly/claude-statusline/issues"
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Load test for statusline.py: many Claude Code sessions refreshing at once.
+
+Usage:
+    # 1. Record real payloads (optional): add to the statusLine command's environment
+    CLAUDE_STATUSLINE_RECORD=~/statusline-payloads.jsonl
+
+    # 2. Replay them as 12 sessions refreshing together, 2 renders/s each, for 30 s
+    ./loadtest.py --payloads ~/statusline-payloads.jsonl --sessions 12 --rate 2 --duration 30
+
+Every session is a thread that starts one `statusline.py` process per tick
+and waits for it, like Claude Code does. By default all sessions tick at the
+same moments, the worst case; --jitter spreads them over the interval.
+Payloads are grouped by session_id (or workspace) and the recorded
+workspaces are mapped onto generated repositories, next to a synthetic
+~/.claude/projects tree and a fake `gh` (see benchmark.py). Without
+--payloads, one payload per session is made up.
+
+Reports latency percentiles, CPU seconds per render (the statusline process
+and the git processes it waited for, from wait4) and peak RSS. Detached
+refresh processes are not part of a render and not counted, nor is the
+daemon's own CPU time with --daemon.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmark import (
+    REPO_DIR, add_repo_args, add_transcript_args, generate_repo, generate_transcripts,
+    wait_for_refresh, write_fake_gh,
+)
+
+SCRIPT = os.path.join(REPO_DIR, 'statusline.py')
+
+# Seconds to wait for the daemon socket to appear (--daemon).
+DAEMON_START_TIMEOUT = 5
+
+
+def load_payloads(path):
+    """Recorded payloads grouped by session: a list of payload lists."""
+    sessions = {}
+    with open(os.path.expanduser(path), encoding='utf-8') as f:
+        for line in f:
+            try:
+                payload = json.loads(line)['payload']
+            except (ValueError, KeyError, TypeError):
+                continue
+            key = payload.get('session_id') or payload.get('workspace', {}).get('current_dir')
+            sessions.setdefault(key, []).append(payload)
+    return list(sessions.values())
+
+
+def synthetic_payloads(sessions, seed):
+    """One made-up payload list per session."""
+    rng = random.Random(seed)
+    models = ('Sonnet 4.5', 'Opus 4.1', 'Sonnet 4.5 (1M context)')
+    return [[{
+        'session_id': f'load-{i}',
+        'model': {'display_name': rng.choice(models)},
+        'workspace': {'current_dir': ''},
+        'context_window': {'used_percentage': rng.randint(0, 100)},
+    }] for i in range(sessions)]
+
+
+def map_workspaces(groups, repos):
+    """Point every payload at a generated repository, one per recorded workspace."""
+    mapping = {}
+    for group in groups:
+        for payload in group:
+            workspace = payload.get('workspace') or {}
+            recorded = workspace.get('current_dir') or payload.get('session_id') or ''
+            if recorded not in mapping:
+                mapping[recorded] = repos[len(mapping) % len(repos)]
+            payload['workspace'] = dict(workspace, current_dir=mapping[recorded])
+            payload.pop('transcript_path', None)
+    return groups
+
+
+def render(payload, env):
+    """Run statusline.py once. Returns (latency_s, cpu_s, max_rss_kb, ok)."""
+    raw = json.dumps(payload).encode('utf-8')
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, SCRIPT], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL, cwd=payload['workspace']['current_dir'], env=env)
+    try:
+        proc.stdin.write(raw)
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass
+    # wait4 instead of proc.wait(): its rusage covers the process and the
+    # children it waited for (git, gh).
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    latency = time.perf_counter() - start
+    return latency, usage.ru_utime + usage.ru_stime, usage.ru_maxrss, proc.returncode == 0
+
+
+def run_session(payloads, env, start_at, interval, end_at, offset, results, lock):
+    """Render payloads in turn at every tick from start_at + offset until end_at."""
+    tick = start_at + offset
+    i = 0
+    while tick < end_at:
+        delay = tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        result = render(payloads[i % len(payloads)], env)
+        with lock:
+            results.append(result)
+        i += 1
+        # A render slower than the interval skips ticks instead of queueing them.
+        tick += interval * max(1, -(-(time.perf_counter() - tick) // interval))
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile p (0-100) of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def start_daemon(env, socket_path):
+    """Start statusline.py --daemon and wait for its socket."""
+    proc = subprocess.Popen([sys.executable, SCRIPT, '--daemon'], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    end = time.monotonic() + DAEMON_START_TIMEOUT
+    while not os.path.exists(socket_path) and time.monotonic() < end:
+        time.sleep(0.01)
+    return proc
+
+
+def prepare(args, work):
+    """Generate transcripts, repositories and the fake gh; returns (env, repos)."""
+    if not os.path.isdir(os.path.join(work, '.claude')):
+        generate_transcripts(work, args.files, args.lines, args.line_bytes, args.usage_share, args.days, args.seed)
+    repos = []
+    for i in range(args.repos):
+        repo = os.path.join(work, f'repo{i}')
+        if not os.path.isdir(repo):
+            generate_repo(repo, args.repo_files, args.dirty, args.diff_lines, args.seed + i)
+        repos.append(repo)
+    bin_dir = os.path.join(work, 'bin')
+    write_fake_gh(bin_dir, args.gh_latency_ms)
+
+    env = dict(os.environ)
+    for name in ('XDG_CACHE_HOME', 'XDG_RUNTIME_DIR', 'CLAUDE_CODE_EFFORT_LEVEL', 'CLAUDE_STATUSLINE_RECORD'):
+        env.pop(name, None)
+    env.update({
+        'HOME': work,
+        'CLAUDE_CONFIG_DIR': os.path.join(work, '.claude'),
+        'CLAUDE_STATUSLINE_CACHE_DIR': os.path.join(work, 'cache'),
+        'CLAUDE_STATUSLINE_SOCKET': os.path.join(work, 'daemon.sock'),
+        'PATH': bin_dir + os.pathsep + env.get('PATH', ''),
+        'COLUMNS': '160',
+    })
+    if args.deadline_ms is not None:
+        env['CLAUDE_STATUSLINE_DEADLINE_MS'] = str(args.deadline_ms)
+    return env, repos
+
+
+def load_test(args):
+    """Run the load test and print (and optionally save) the report."""
+    work = args.workdir or tempfile.mkdtemp(prefix='statusline-load-')
+    daemon = None
+    try:
+        env, repos = prepare(args, work)
+        groups = load_payloads(args.payloads) if args.payloads else synthetic_payloads(args.sessions, args.seed)
+        if not groups:
+            sys.exit(f"no payloads in {args.payloads}")
+        groups = map_workspaces(groups, repos)
+        shutil.rmtree(env['CLAUDE_STATUSLINE_CACHE_DIR'], ignore_errors=True)
+        if args.daemon:
+            daemon = start_daemon(env, env['CLAUDE_STATUSLINE_SOCKET'])
+        if not args.cold:
+            for group in groups:
+                render(group[0], env)
+            wait_for_refresh(env['CLAUDE_STATUSLINE_CACHE_DIR'])
+
+        rng = random.Random(args.seed)
+        interval = 1 / args.rate
+        results = []
+        lock = threading.Lock()
+        start_at = time.perf_counter() + 0.1
+        end_at = start_at + args.duration
+        threads = [
+            threading.Thread(target=run_session, args=(
+                groups[i % len(groups)], env, start_at, interval, end_at,
+                rng.uniform(0, interval * args.jitter), results, lock,
+            ))
+            for i in range(args.sessions)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start_at
+        wait_for_refresh(env['CLAUDE_STATUSLINE_CACHE_DIR'])
+    finally:
+        if daemon:
+            daemon.terminate()
+            daemon.wait()
+        if not args.workdir and not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+    latencies = sorted(r[0] * 1000 for r in results)
+    cpu = [r[1] for r in results]
+    report = {
+        'sessions': args.sessions,
+        'rate_per_session': args.rate,
+        'duration_s': round(elapsed, 2),
+        'daemon': args.daemon,
+        'renders': len(results),
+        'failed': sum(1 for r in results if not r[3]),
+        'renders_per_s': round(len(results) / elapsed, 2) if elapsed > 0 else 0,
+        'latency_ms': {f'p{p}': round(percentile(latencies, p), 1) for p in (50, 95, 99)},
+        'max_latency_ms': round(latencies[-1], 1) if latencies else 0,
+        'cpu_s_per_render': round(sum(cpu) / len(cpu), 4) if cpu else 0,
+        'peak_rss_mb': round(max((r[2] for r in results), default=0) / 1024, 1),
+    }
+    print(f"{report['renders']} renders ({report['failed']} failed) from {args.sessions} sessions "
+          f"in {report['duration_s']} s, {report['renders_per_s']}/s")
+    print("latency    " + "  ".join(f"{name} {value:7.1f} ms" for name, value in report['latency_ms'].items())
+          + f"  max {report['max_latency_ms']:7.1f} ms")
+    print(f"cpu        {report['cpu_s_per_render'] * 1000:.1f} ms per render")
+    print(f"peak rss   {report['peak_rss_mb']} MB")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for statusline.py")
+    parser.add_argument('--payloads', help="JSONL file recorded with CLAUDE_STATUSLINE_RECORD")
+    parser.add_argument('--sessions', type=int, default=12, help="concurrent Claude Code sessions")
+    parser.add_argument('--rate', type=float, default=1.0, help="renders per second per session")
+    parser.add_argument('--duration', type=float, default=20.0, help="seconds to run")
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help="spread session ticks over this fraction of the interval (0: all at once)")
+    parser.add_argument('--repos', type=int, default=1, help="generated repositories the workspaces map onto")
+    parser.add_argument('--daemon', action='store_true', help="run against the resident daemon")
+    parser.add_argument('--cold', action='store_true', help="skip the warm-up render of every session")
+    parser.add_argument('--deadline-ms', type=int, help="CLAUDE_STATUSLINE_DEADLINE_MS for the renders")
+    add_transcript_args(parser)
+    add_repo_args(parser, prefix='repo-')
+    parser.add_argument('--gh-latency-ms', type=float, default=200, help="latency of the fake gh")
+    parser.add_argument('--workdir', help="generate into (and reuse) this directory instead of a temporary one")
+    parser.add_argument('--keep', action='store_true', help="keep the temporary directory")
+    parser.add_argument('--json', help="also write the report to this file")
+    load_test(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2984 @@
+"""
+Renderer of the Claude Code statusline, behind the statusline.py entry point
+Shows: [git info] | [PR info] | [🧠 context] | [🔋 tokens] | [⏱️ timer] | [🤖 model]
+
+Features:
+- Real token usage tracking from .jsonl files
+- Adaptive P90 limits from usage history
+- 5-hour session countdown timer
+- Colored progress bars and git status badges
+
+Repository: https://github.com/haraldschilly/claude-statusline
+Inspired by: https://github.com/leeguooooo/claude-code-usage-bar
+"""
+
+from __future__ import annotations
+
+# Startup time is part of every render, so only modules needed on the common
+# path are imported here; the rest (subprocess, multiprocessing, socketserver,
+# ...) are imported where they are used.
+import time
+
+# Start of the module import and, estimated from the CPU time used so far
+# (interpreter start and compilation do not wait on much else), of the
+# process: for the trace and the render time segment.
+_IMPORT_START = time.perf_counter()
+_PROCESS_START = _IMPORT_START - time.process_time()
+
+import binascii
+import heapq
+import json
+import math
+import re
+import sys
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+
+from statusline import (
+    DAEMON_ENV_VARS, DAEMON_TIMEOUT, RENDER_TIME_WIDTH, env_flag, get_socket_path, get_term_width,
+    request_from_daemon, socket_owned,
+)
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Optional, Dict, Any, List
+
+# Decoder of transcript lines; use_fast_json() swaps in orjson.
+json_loads = json.loads
+_fast_json_checked = False
+
+ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
+
+# Section header of a git config file: [section], [section "subsection"] or
+# the legacy [section.subsection].
+GIT_SECTION_RE = re.compile(r'\[\s*([A-Za-z0-9.-]+)(?:\s+"((?:[^"\\]|\\.)*)")?\s*\]')
+
+# Bump when the on-disk cache layout changes; older caches are then ignored.
+CACHE_VERSION = 5
+USAGE_INDEX_FILE = 'usage-index.json'
+LAST_VALUES_FILE = 'last-values.json'
+
+# Last values not used for LAST_VALUES_MAX_AGE seconds are dropped, and at
+# most LAST_VALUES_MAX_ENTRIES, the most recently used, are kept. An
+# unchanged value's use time is saved at most every LAST_VALUES_TOUCH
+# seconds, so renders do not rewrite the file just to refresh it.
+LAST_VALUES_MAX_AGE = 7 * 86400
+LAST_VALUES_MAX_ENTRIES = 256
+LAST_VALUES_TOUCH = 3600
+
+# Transcript lines without both markers are skipped without decoding.
+USAGE_MARKER = b'"usage"'
+TIMESTAMP_MARKER = b'"timestamp"'
+
+# Claude Code writes assistant lines compactly, as {…,"message":{"model":"…",
+# …,"usage":{…}},…,"timestamp":"…"}: model first and usage last in the
+# message, the timestamp after it. Of lines in this layout, only the usage
+# object is decoded; the others are decoded whole.
+MESSAGE_MODEL_KEY = b'"message":{"model":"'
+USAGE_KEY = b'"usage":{'
+TIMESTAMP_KEY = b'"timestamp":"'
+
+# Dollars per million input, output, cache write and cache read tokens. A
+# model uses the first entry whose pattern is part of its name; entries from
+# the JSON file named by CLAUDE_STATUSLINE_PRICING ({"pattern": [4 rates]})
+# are tried first. Unknown models are priced like Sonnet.
+MODEL_PRICING = (
+    ('opus-4-1', (15.0, 75.0, 18.75, 1.50)),
+    ('opus-4-2025', (15.0, 75.0, 18.75, 1.50)),
+    ('3-opus', (15.0, 75.0, 18.75, 1.50)),
+    ('opus', (5.0, 25.0, 6.25, 0.50)),
+    ('3-5-haiku', (0.80, 4.0, 1.0, 0.08)),
+    ('3-haiku', (0.25, 1.25, 0.30, 0.03)),
+    ('haiku', (1.0, 5.0, 1.25, 0.10)),
+)
+DEFAULT_PRICING = (3.0, 15.0, 3.75, 0.30)
+
+# Token counters of a usage entry and their transcript fields, in the order
+# of the pricing rates.
+# Session totals and limits count all but cache reads.
+TOKEN_TYPES = ('input', 'output', 'cache_creation', 'cache_read')
+USAGE_FIELDS = ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens')
+
+# Per-file columns of the usage index, with their array type codes; entry
+# tuples hold the same fields, with the model name in place of its number.
+ENTRY_COLUMNS = (('ts', 'd'), ('cost', 'd'), *((name, 'q') for name in TOKEN_TYPES), ('model', 'H'))
+
+# Rolling usage windows. CLAUDE_STATUSLINE_WINDOWS (e.g. "24h,7d") picks the
+# windows whose totals are shown in the statusline; --report breaks them down.
+USAGE_WINDOWS = (('5h', 5 * 3600), ('24h', 24 * 3600), ('7d', 7 * 86400))
+
+# Once windows are shown or reported, the usage index also keeps per
+# transcript one row of WINDOW_COLUMNS per minute ('ts' is its start) and
+# model back to the start of the longest window, fed by the same scan.
+WINDOW_BUCKET_SECONDS = 60
+WINDOW_COLUMNS = (('ts', 'd'), ('cost', 'd'), *((name, 'q') for name in TOKEN_TYPES), ('messages', 'q'), ('model', 'H'))
+
+# Newly indexed transcripts are read backwards in blocks of this size, down
+# to the history cutoff. Timestamps and mtimes get TIMESTAMP_SLACK seconds of
+# leeway against the cutoff, for slightly out-of-order lines and clock skew.
+REVERSE_BLOCK_SIZE = 65536
+TIMESTAMP_SLACK = 3600
+
+# Cold start: parse transcripts in a pool of up to PARALLEL_SCAN_WORKERS
+# processes once more than PARALLEL_SCAN_BYTES have to be read.
+PARALLEL_SCAN_BYTES = 64 * 1024 * 1024
+PARALLEL_SCAN_WORKERS = 8
+
+# Project directories without recent transcripts are not walked again until
+# their mtime changes (a file was added) or COLD_DIR_RECHECK seconds passed,
+# which catches old sessions being resumed.
+COLD_DIR_RECHECK = 300
+
+# Usage sessions last 5 hours. A fresh usage index is seeded with the
+# sessions of the last HISTORY_DAYS days.
+SESSION_SECONDS = 5 * 3600
+HISTORY_DAYS = 90
+
+# Adaptive limits: the LIMIT_PERCENTILE-th percentile of closed sessions
+# (CLAUDE_STATUSLINE_LIMIT_PERCENTILE), read from quantile sketches with
+# SKETCH_ACCURACY relative error and at most SKETCH_MAX_BINS buckets. With
+# CLAUDE_STATUSLINE_HALF_LIFE_DAYS set, older sessions weigh half as much
+# every that many days; by default (LIMIT_HALF_LIFE_DAYS = 0) all weigh the same.
+LIMIT_PERCENTILE = 90
+LIMIT_HALF_LIFE_DAYS = 0
+SKETCH_ACCURACY = 0.01
+SKETCH_MAX_BINS = 1024
+SKETCH_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+
+# Git status cache (per repository): a result is reused while HEAD, refs,
+# config, index and the already-dirty files are unchanged, but for at most
+# GIT_STATUS_MAX_AGE seconds (CLAUDE_STATUSLINE_GIT_MAX_AGE), since edits to
+# clean files leave no trace outside the working tree. Only the first
+# GIT_DIRTY_STAT_LIMIT dirty files are checked. Repositories tracking more
+# than CLAUDE_STATUSLINE_GIT_MAX_FILES files (0 = no limit) skip line stats.
+# Repositories not queried for GIT_CACHE_MAX_AGE seconds are dropped, along
+# with their lock and numstat files.
+GIT_CACHE_FILE = 'git-cache.json'
+GIT_STATUS_MAX_AGE = 10
+GIT_DIRTY_STAT_LIMIT = 256
+GIT_CACHE_MAX_AGE = 86400
+
+# +/- line counts are cached per dirty file, keyed by its worktree stat and
+# its HEAD and index blob ids; only files whose key changed are diffed
+# again, NUMSTAT_BATCH paths per `git diff --numstat` call. The counts grow
+# with the dirty tree, so they are kept per repository in NUMSTAT_FILE, read
+# only when git status runs, not with GIT_CACHE_FILE on every render.
+NUMSTAT_BATCH = 500
+NUMSTAT_FILE = 'numstat-{}.json'
+
+# PR cache (per repository, branch and HEAD commit): seconds until a found
+# PR, a "no PR" answer and a missing gh CLI are looked up again, and after
+# which unused entries are dropped.
+PR_CACHE_FILE = 'pr-cache.json'
+PR_CACHE_TTL = 300
+PR_NEGATIVE_TTL = 60
+GH_MISSING_TTL = 3600
+PR_CACHE_MAX_AGE = 86400
+
+# Connections the daemon queues while all its threads are busy; clients
+# retry a full queue briefly (see statusline.request_from_daemon).
+DAEMON_BACKLOG = 128
+
+# Rendered statuslines of one-shot runs, keyed by the payload fields that
+# affect the output, the terminal width and the forwarded environment. A
+# line is printed again without running any collector while the git,
+# transcript and settings fingerprints are unchanged (see output_fingerprint),
+# but for at most OUTPUT_CACHE_TTL seconds, as worktree edits, the reset
+# countdown and background refreshes leave no trace in them.
+OUTPUT_CACHE_FILE = 'output-cache.json'
+OUTPUT_CACHE_TTL = 5
+
+# Expensive refreshes of shared caches (usage index, git status and PR per
+# repository) are coordinated through advisory locks in the cache directory:
+# one process refreshes, the others wait up to LOCK_TIMEOUT seconds for its
+# result and otherwise use the previous snapshot.
+LOCK_TIMEOUT = 10
+LOCK_POLL_INTERVAL = 0.01
+
+# Watch mode: file events are gathered until none arrived for WATCH_DEBOUNCE
+# seconds before re-rendering; without inotify, the sources are polled every
+# WATCH_POLL_INTERVAL seconds instead.
+WATCH_DEBOUNCE = 0.02
+WATCH_POLL_INTERVAL = 1.0
+
+# Timing instrumentation, enabled with CLAUDE_STATUSLINE_TRACE=1 or --trace:
+# the spans (collectors, subprocesses, layout) and counters of every render
+# are appended to TRACE_FILE in the cache dir in Chrome trace-event format,
+# for chrome://tracing or ui.perfetto.dev. Beyond TRACE_MAX_BYTES the file is
+# rotated to TRACE_FILE + '.1'.
+TRACE_FILE = 'trace.json'
+TRACE_MAX_BYTES = 4 * 1024 * 1024
+
+# Overall time budget for collecting git, PR, usage and settings data
+# (override with CLAUDE_STATUSLINE_DEADLINE_MS). Late collectors finish in a
+# detached refresh process; its marker counts as stale after REFRESH_TIMEOUT
+# seconds, in case that process died.
+DEFAULT_DEADLINE_MS = 150
+REFRESH_TIMEOUT = 30
+
+# Terminal display widths, as sorted (first, last) code point ranges. Two
+# columns: East Asian Wide and Fullwidth characters and emoji with default
+# emoji presentation. Zero columns: combining marks, zero-width spaces and
+# joiners, variation selectors, skin tone modifiers and tags. Everything
+# else takes one column. A character after a ZWJ joins the preceding emoji,
+# and VS16 turns a one-column text-presentation character (⏱ in ⏱️) into a
+# two-column emoji.
+WIDE_RANGES = (
+    (0x1100, 0x115F), (0x231A, 0x231B), (0x2329, 0x232A), (0x23E9, 0x23EC), (0x23F0, 0x23F0),
+    (0x23F3, 0x23F3), (0x25FD, 0x25FE), (0x2614, 0x2615), (0x2648, 0x2653), (0x267F, 0x267F),
+    (0x2693, 0x2693), (0x26A1, 0x26A1), (0x26AA, 0x26AB), (0x26BD, 0x26BE), (0x26C4, 0x26C5),
+    (0x26CE, 0x26CE), (0x26D4, 0x26D4), (0x26EA, 0x26EA), (0x26F2, 0x26F3), (0x26F5, 0x26F5),
+    (0x26FA, 0x26FA), (0x26FD, 0x26FD), (0x2705, 0x2705), (0x270A, 0x270B), (0x2728, 0x2728),
+    (0x274C, 0x274C), (0x274E, 0x274E), (0x2753, 0x2755), (0x2757, 0x2757), (0x2795, 0x2797),
+    (0x27B0, 0x27B0), (0x27BF, 0x27BF), (0x2B1B, 0x2B1C), (0x2B50, 0x2B50), (0x2B55, 0x2B55),
+    (0x2E80, 0x3029), (0x302E, 0x303E), (0x3041, 0x3098), (0x309B, 0x4DBF), (0x4E00, 0xA4CF),
+    (0xA960, 0xA97F), (0xAC00, 0xD7A3), (0xF900, 0xFAFF), (0xFE10, 0xFE19), (0xFE30, 0xFE6F),
+    (0xFF00, 0xFF60), (0xFFE0, 0xFFE6), (0x16FE0, 0x16FE4), (0x17000, 0x18CFF), (0x1B000, 0x1B2FF),
+    (0x1F004, 0x1F004), (0x1F0CF, 0x1F0CF), (0x1F18E, 0x1F18E), (0x1F191, 0x1F19A), (0x1F200, 0x1F202),
+    (0x1F210, 0x1F23B), (0x1F240, 0x1F248), (0x1F250, 0x1F251), (0x1F260, 0x1F265), (0x1F300, 0x1F320),
+    (0x1F32D, 0x1F335), (0x1F337, 0x1F37C), (0x1F37E, 0x1F393), (0x1F3A0, 0x1F3CA), (0x1F3CF, 0x1F3D3),
+    (0x1F3E0, 0x1F3F0), (0x1F3F4, 0x1F3F4), (0x1F3F8, 0x1F3FA), (0x1F400, 0x1F43E), (0x1F440, 0x1F440),
+    (0x1F442, 0x1F4FC), (0x1F4FF, 0x1F53D), (0x1F54B, 0x1F54E), (0x1F550, 0x1F567), (0x1F57A, 0x1F57A),
+    (0x1F595, 0x1F596), (0x1F5A4, 0x1F5A4), (0x1F5FB, 0x1F64F), (0x1F680, 0x1F6C5), (0x1F6CC, 0x1F6CC),
+    (0x1F6D0, 0x1F6D2), (0x1F6D5, 0x1F6D7), (0x1F6DC, 0x1F6DF), (0x1F6EB, 0x1F6EC), (0x1F6F4, 0x1F6FC),
+    (0x1F7E0, 0x1F7EB), (0x1F7F0, 0x1F7F0), (0x1F90C, 0x1F93A), (0x1F93C, 0x1F945), (0x1F947, 0x1F9FF),
+    (0x1FA70, 0x1FAFF), (0x20000, 0x2FFFD), (0x30000, 0x3FFFD),
+)
+ZERO_WIDTH_RANGES = (
+    (0x0300, 0x036F), (0x0483, 0x0489), (0x0591, 0x05BD), (0x05BF, 0x05BF), (0x05C1, 0x05C2),
+    (0x05C4, 0x05C5), (0x05C7, 0x05C7), (0x0610, 0x061A), (0x064B, 0x065F), (0x0670, 0x0670),
+    (0x06D6, 0x06DC), (0x06DF, 0x06E4), (0x06E7, 0x06E8), (0x06EA, 0x06ED), (0x0900, 0x0902),
+    (0x093A, 0x093A), (0x093C, 0x093C), (0x0941, 0x0948), (0x094D, 0x094D), (0x0951, 0x0957),
+    (0x0E31, 0x0E31), (0x0E34, 0x0E3A), (0x0E47, 0x0E4E), (0x1160, 0x11FF), (0x1AB0, 0x1AFF),
+    (0x1DC0, 0x1DFF), (0x200B, 0x200F), (0x202A, 0x202E), (0x2060, 0x2064), (0x20D0, 0x20FF),
+    (0x302A, 0x302D), (0x3099, 0x309A), (0xFE00, 0xFE0F), (0xFE20, 0xFE2F), (0xFEFF, 0xFEFF),
+    (0x1F3FB, 0x1F3FF), (0xE0001, 0xE0001), (0xE0020, 0xE007F), (0xE0100, 0xE01EF),
+)
+ZWJ = 0x200D
+VS16 = 0xFE0F
+# A pair of regional indicators is one flag.
+REGIONAL_INDICATORS = (0x1F1E6, 0x1F1FF)
+# Strings without these take the per-character fast path of char_widths().
+CLUSTER_RE = re.compile('[\u200d\ufe0f\U0001F1E6-\U0001F1FF]')
+
+# Adaptive truncation: (initial, minimum) display budgets of the branch name
+# and PR title, shrunk together by SHRINK_STEP until the statusline fits.
+BRANCH_BUDGET = (60, 10)
+PR_TITLE_BUDGET = (80, 12)
+SHRINK_STEP = 4
+
+
+# WIDE_RANGES and ZERO_WIDTH_RANGES merged into one bisectable table.
+_WIDTH_TABLE = sorted([(*r, 2) for r in WIDE_RANGES] + [(*r, 0) for r in ZERO_WIDTH_RANGES])
+_WIDTH_STARTS = [first for first, _, _ in _WIDTH_TABLE]
+_WIDTH_ENDS = [last for _, last, _ in _WIDTH_TABLE]
+_WIDTH_VALUES = [width for _, _, width in _WIDTH_TABLE]
+
+
+@lru_cache(maxsize=None)
+def char_width(ch: str) -> int:
+    """Display width of a single character on its own, from _WIDTH_TABLE."""
+    cp = ord(ch)
+    i = bisect_right(_WIDTH_STARTS, cp) - 1
+    return _WIDTH_VALUES[i] if i >= 0 and cp <= _WIDTH_ENDS[i] else 1
+
+
+def char_widths(s: str) -> List[int]:
+    """Display width of every character of plain string s (no ANSI).
+
+    Emoji sequences count as one cluster: see WIDE_RANGES. All columns of a
+    cluster go to its first character, so a cut never splits one.
+    """
+    if s.isascii():
+        return [1] * len(s)
+    if not CLUSTER_RE.search(s):
+        return list(map(char_width, s))
+    widths = []
+    base = 0  # width of the last character that took up columns
+    last = 0  # and its index
+    joined = False
+    regional = False  # the last character opens a regional indicator pair
+    first_ri, last_ri = REGIONAL_INDICATORS
+    for ch in s:
+        cp = ord(ch)
+        width = char_width(ch)
+        pair = regional and first_ri <= cp <= last_ri
+        regional = False
+        if joined:
+            width = 0
+        elif cp == VS16:
+            # Emoji presentation widens a narrow base to two columns.
+            if base == 1:
+                widths[last] += 1
+            width = 0
+            base = 2
+        elif pair:
+            widths[last] += width
+            width = 0
+        elif width:
+            base = width
+            last = len(widths)
+            regional = first_ri <= cp <= last_ri
+        joined = cp == ZWJ
+        widths.append(width)
+    return widths
+
+
+@lru_cache(maxsize=1024)
+def prefix_widths(s: str) -> tuple:
+    """Display widths of the prefixes of plain string s: element i is the width of s[:i]."""
+    total = 0
+    prefixes = [0]
+    for width in char_widths(s):
+        total += width
+        prefixes.append(total)
+    return tuple(prefixes)
+
+
+@lru_cache(maxsize=1024)
+def visible_len(s: str) -> int:
+    """Display width in terminal columns, ignoring ANSI escapes."""
+    stripped = ANSI_RE.sub('', s)
+    if stripped.isascii():
+        return len(stripped)
+    return sum(char_widths(stripped))
+
+
+def truncated_length(widths: tuple, max_len: int) -> Optional[int]:
+    """Characters truncate() keeps of a string with prefix_widths widths, or None for all."""
+    if widths[-1] <= max_len or len(widths) < 2:
+        return None
+    # Zero-width characters (joined emoji, combining marks) stay with their
+    # cluster; at least the first cluster is kept.
+    return bisect_right(widths, max(1, max_len - 1, widths[1])) - 1
+
+
+def truncate(s: str, max_len: int) -> str:
+    """Truncate plain string (no ANSI) to max display width, appending …."""
+    keep = truncated_length(prefix_widths(s), max_len)
+    return s if keep is None else s[:keep] + '…'
+
+
+class Segment:
+    """One component of the statusline, rendered as prefix + text + suffix.
+
+    Only text may be truncated: its budget shrinks from budget down to
+    min_budget. prefix and suffix are fixed, so their width is measured once,
+    and the width of text at any budget is looked up in its prefix widths.
+    """
+
+    __slots__ = ('prefix', 'text', 'suffix', 'budget', 'min_budget', 'fixed_width')
+
+    def __init__(self, prefix: str, text: str = '', suffix: str = '', budget: int = 0, min_budget: int = 0):
+        self.prefix = prefix
+        self.text = text
+        self.suffix = suffix
+        self.budget = budget
+        self.min_budget = min_budget
+        self.fixed_width = visible_len(prefix) + visible_len(suffix)
+
+    def budget_at(self, step: int) -> int:
+        """Text budget after step shrink steps."""
+        return max(self.min_budget, self.budget - step * SHRINK_STEP)
+
+    def render(self, budget: Optional[int] = None) -> str:
+        if not self.text:
+            return self.prefix + self.suffix
+        return self.prefix + truncate(self.text, self.budget if budget is None else budget) + self.suffix
+
+    def width(self, budget: int) -> int:
+        if not self.text:
+            return self.fixed_width
+        widths = prefix_widths(self.text)
+        keep = truncated_length(widths, budget)
+        return self.fixed_width + (widths[-1] if keep is None else widths[keep] + 1)
+
+
+def layout_statusline(segments: List[Segment], term_width: int, separator: str = " | ") -> str:
+    """Join segments, shrinking all truncatable texts in lockstep to fit term_width.
+
+    All texts shrink by SHRINK_STEP per step until the line fits or every
+    text is at its minimum. The total width only decreases with the step
+    count, so the smallest fitting step is found by binary search over the
+    precomputed segment widths.
+    """
+    with trace_span('layout_statusline', 'layout', segments=len(segments)):
+        fixed = visible_len(separator) * max(0, len(segments) - 1)
+        fixed += sum(seg.fixed_width for seg in segments if not seg.text)
+        shrinkable = [seg for seg in segments if seg.text]
+
+        def total_width(step):
+            return fixed + sum(seg.width(seg.budget_at(step)) for seg in shrinkable)
+
+        max_step = max((-(-(seg.budget - seg.min_budget) // SHRINK_STEP) for seg in shrinkable), default=0)
+        lo, hi = 0, max_step
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if total_width(mid) <= term_width:
+                hi = mid
+            else:
+                lo = mid + 1
+        return separator.join(seg.render(seg.budget_at(lo)) for seg in segments)
+
+
+# Trace events and counters of this process, flushed to TRACE_FILE by
+# flush_trace(); _trace_events is None while tracing is off.
+_trace_events: Optional[List[Dict[str, Any]]] = [] if env_flag('CLAUDE_STATUSLINE_TRACE') else None
+_trace_counters: Dict[str, int] = {}
+_trace_lock = threading.Lock()
+# Epoch seconds at perf_counter() zero, so traces of concurrent processes line up.
+_trace_epoch = time.time() - time.perf_counter()
+
+
+class TraceSpan:
+    """Times a with-block as one complete ('X') trace event; see trace_span()."""
+
+    __slots__ = ('name', 'cat', 'args', 'start')
+
+    def __init__(self, name: Optional[str], cat: str = '', args: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        if self.name is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.name is not None:
+            record_span(self.name, self.cat, self.start, time.perf_counter(), self.args)
+
+
+# Shared span of every trace_span() call while tracing is off.
+_NO_SPAN = TraceSpan(None)
+
+
+def trace_span(name: str, cat: str, **args) -> TraceSpan:
+    """Context manager recording a span of category cat, if tracing is on."""
+    if _trace_events is None:
+        return _NO_SPAN
+    return TraceSpan(name, cat, args)
+
+
+def record_span(name: str, cat: str, start: float, end: float, args: Optional[Dict[str, Any]] = None) -> None:
+    """Add a span between two perf_counter() readings to the trace."""
+    if _trace_events is None:
+        return
+    event = {
+        'name': name, 'cat': cat, 'ph': 'X',
+        'ts': round((_trace_epoch + start) * 1e6), 'dur': round((end - start) * 1e6),
+        'pid': os.getpid(), 'tid': threading.get_native_id(),
+    }
+    if args:
+        event['args'] = args
+    with _trace_lock:
+        _trace_events.append(event)
+
+
+def count(name: str, n: int = 1) -> None:
+    """Add n to trace counter name (lines parsed, cache hits, ...), if tracing is on."""
+    if _trace_events is None:
+        return
+    with _trace_lock:
+        _trace_counters[name] = _trace_counters.get(name, 0) + n
+
+
+def start_trace() -> None:
+    """Turn tracing on (--trace), also for refresh processes started from here."""
+    global _trace_events
+    os.environ['CLAUDE_STATUSLINE_TRACE'] = '1'
+    if _trace_events is None:
+        _trace_events = []
+
+
+def flush_trace(process_name: str) -> None:
+    """Append the recorded spans and counters to TRACE_FILE and start afresh."""
+    if _trace_events is None:
+        return
+    with _trace_lock:
+        events = _trace_events[:]
+        counters = dict(_trace_counters)
+        _trace_events.clear()
+        _trace_counters.clear()
+    pid = os.getpid()
+    if counters:
+        events.append({'name': 'counters', 'ph': 'C', 'ts': round(time.time() * 1e6), 'pid': pid, 'args': counters})
+    events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': f"{process_name} {pid}"}})
+
+    # The JSON array format allows leaving the array open, so every process
+    # appends its events in one write.
+    path = get_cache_dir() / TRACE_FILE
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if path.stat().st_size > TRACE_MAX_BYTES:
+                os.replace(path, path.with_name(TRACE_FILE + '.1'))
+        except FileNotFoundError:
+            pass
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            os.write(fd, b'[\n')
+            os.close(fd)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+        try:
+            os.write(fd, ''.join(json.dumps(event) + ',\n' for event in events).encode('utf-8'))
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def run_cmd(cmd, cwd=None, check=False):
+    """Run a command and return its output, or None on error.
+
+    A string is run through the shell; an argument list is executed
+    directly, which saves spawning /bin/sh.
+    """
+    try:
+        import subprocess
+        with trace_span(cmd if isinstance(cmd, str) else ' '.join(cmd[:3]), 'subprocess', cwd=str(cwd)):
+            result = subprocess.run(
+                cmd,
+                shell=isinstance(cmd, str),
+                capture_output=True,
+                text=True,
+                cwd=cwd,
+                timeout=2
+            )
+        if check and result.returncode != 0:
+            return None
+        return result.stdout.strip()
+    except (OSError, subprocess.TimeoutExpired, subprocess.SubprocessError):
+        return None
+
+
+def find_git_toplevel(cwd) -> Optional[Path]:
+    """Walk up from cwd to the directory containing .git (dir or gitdir file)."""
+    try:
+        path = Path(cwd).resolve()
+    except OSError:
+        return None
+    for directory in (path, *path.parents):
+        if (directory / '.git').exists():
+            return directory
+    return None
+
+
+def find_git_dir(toplevel: Path) -> Optional[Path]:
+    """The git directory of a work tree: .git itself, or where a gitdir file points."""
+    dot_git = toplevel / '.git'
+    if dot_git.is_dir():
+        return dot_git
+    try:
+        content = dot_git.read_text(encoding='utf-8').strip()
+    except OSError:
+        return None
+    if not content.startswith('gitdir:'):
+        return None
+    return toplevel / content[len('gitdir:'):].strip()
+
+
+def find_git_common_dir(git_dir: Path) -> Path:
+    """Directory with refs and config shared by all worktrees of a repository."""
+    try:
+        return git_dir / (git_dir / 'commondir').read_text(encoding='utf-8').strip()
+    except OSError:
+        return git_dir
+
+
+def resolve_git_ref(git_dir: Path, common_dir: Path, ref: str) -> Optional[str]:
+    """Commit id of ref from loose ref files or packed-refs, or None if it does not exist."""
+    for _ in range(5):  # symbolic refs pointing to symbolic refs
+        value = None
+        for base in (git_dir, common_dir):
+            try:
+                value = (base / ref).read_text(encoding='utf-8').strip()
+                break
+            except OSError:
+                pass
+        if value is None:
+            try:
+                with open(common_dir / 'packed-refs', encoding='utf-8') as f:
+                    for line in f:
+                        if line[:1] not in ('#', '^') and line.rstrip('\n').endswith(' ' + ref):
+                            value = line.split(' ', 1)[0]
+                            break
+            except OSError:
+                pass
+        if value and value.startswith('ref: '):
+            ref = value[len('ref: '):]
+            continue
+        return value or None
+    return None
+
+
+def read_git_head(git_dir: Path) -> Optional[tuple]:
+    """(branch, commit) of HEAD, read from the files under git_dir without running git.
+
+    branch is None for a detached HEAD and commit is None on a branch
+    without commits yet. Returns None if the refs can't be read this way
+    (e.g. the reftable ref storage).
+    """
+    common_dir = find_git_common_dir(git_dir)
+    try:
+        head = (git_dir / 'HEAD').read_text(encoding='utf-8').strip()
+    except OSError:
+        return None
+    if not head.startswith('ref: '):
+        try:
+            int(head, 16)
+        except ValueError:
+            return None
+        return None, head
+    ref = head[len('ref: '):]
+    if not ref.startswith('refs/heads/') or (common_dir / 'reftable').is_dir():
+        return None
+    return ref[len('refs/heads/'):], resolve_git_ref(git_dir, common_dir, ref)
+
+
+def parse_git_config_value(value: str) -> str:
+    """Unquote a git config value and strip a trailing comment."""
+    out = []
+    quoted = False
+    chars = iter(value.strip())
+    for c in chars:
+        if c == '\\':
+            c = next(chars, '')
+            out.append({'n': '\n', 't': '\t', 'b': '\b'}.get(c, c))
+        elif c == '"':
+            quoted = not quoted
+        elif c in '#;' and not quoted:
+            break
+        else:
+            out.append(c)
+    return ''.join(out).strip()
+
+
+def read_git_config(path: Path) -> Dict[tuple, Dict[str, str]]:
+    """Sections of a git config file as {(section, subsection): {key: value}}.
+
+    Section and key names are lower-cased; subsection is None for plain
+    sections. Includes are not followed and for multi-valued keys the last
+    value wins, which is enough for the [branch] and [remote] sections.
+    """
+    config: Dict[tuple, Dict[str, str]] = {}
+    try:
+        text = path.read_text(encoding='utf-8', errors='replace')
+    except OSError:
+        return config
+    current = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('['):
+            match = GIT_SECTION_RE.match(line)
+            if not match:
+                current = None
+                continue
+            name, sub = match.groups()
+            if sub is not None:
+                sub = re.sub(r'\\(.)', r'\1', sub)
+            elif '.' in name:
+                name, sub = name.split('.', 1)
+            current = config.setdefault((name.lower(), sub), {})
+            line = line[match.end():].strip()
+        if not line or line[0] in '#;' or current is None:
+            continue
+        key, sep, value = line.partition('=')
+        current[key.strip().lower()] = parse_git_config_value(value) if sep else 'true'
+    return config
+
+
+def git_branch_remote(config: Dict[tuple, Dict[str, str]], branch: Optional[str]) -> str:
+    """Remote of the branch's upstream, else 'origin', else the first remote (by name), else 'local'."""
+    remote = config.get(('branch', branch), {}).get('remote') if branch else None
+    if remote and remote != '.':
+        return remote
+    remotes = sorted(sub for section, sub in config if section == 'remote' and sub)
+    if 'origin' in remotes:
+        return 'origin'
+    return remotes[0] if remotes else 'local'
+
+
+def stat_key(path) -> Optional[List[int]]:
+    """[mtime_ns, size] of path, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def git_fingerprint(git_dir: Path) -> Optional[List[Any]]:
+    """Cheap fingerprint of HEAD, refs, config and index, or None if unreadable."""
+    common_dir = find_git_common_dir(git_dir)
+    try:
+        head = (git_dir / 'HEAD').read_text(encoding='utf-8').strip()
+    except OSError:
+        return None
+    fingerprint = [
+        head,
+        stat_key(git_dir / 'index'),
+        stat_key(common_dir / 'packed-refs'),
+        stat_key(common_dir / 'config'),
+    ]
+    if head.startswith('ref: '):
+        fingerprint.append(stat_key(common_dir / head[len('ref: '):]))
+    return fingerprint
+
+
+def git_index_entries(git_dir: Path) -> int:
+    """Number of tracked files, read from the index header."""
+    try:
+        with open(git_dir / 'index', 'rb') as f:
+            header = f.read(12)
+    except OSError:
+        return 0
+    if len(header) < 12 or header[:4] != b'DIRC':
+        return 0
+    return int.from_bytes(header[8:12], 'big')
+
+
+def get_env_int(name: str, default: int, env: Optional[Dict[str, str]] = None) -> int:
+    """Integer from environment variable name (of env, default os.environ), or default if unset or invalid."""
+    if env is None:
+        env = os.environ
+    try:
+        return int(env.get(name) or default)
+    except ValueError:
+        return default
+
+
+# Git status results per repository toplevel; see GIT_CACHE_FILE.
+_git_cache: Optional[Dict[str, Any]] = None
+_git_cache_lock = threading.Lock()
+
+
+def collect_git_status(cwd, env: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
+    """Collect git state, reusing the cached result while the repo is unchanged.
+
+    env holds the settings of the render (default os.environ), which the
+    daemon receives with each request.
+
+    Returns a dict with toplevel, branch, remote, head, added/modified/deleted
+    file counts and lines_added/lines_removed, or None outside a repo.
+    """
+    global _git_cache
+    toplevel = find_git_toplevel(cwd)
+    if not toplevel:
+        return None
+    git_dir = find_git_dir(toplevel)
+    key = str(toplevel)
+    with _git_cache_lock:
+        if _git_cache is None:
+            _git_cache = (load_cache(GIT_CACHE_FILE) or {}).get('repos', {})
+        entry = _git_cache.get(key)
+
+    max_age = get_env_int('CLAUDE_STATUSLINE_GIT_MAX_AGE', GIT_STATUS_MAX_AGE, env)
+    if git_cache_fresh(entry, git_dir, toplevel, max_age):
+        count('git_cache.hit')
+        return entry['result']
+    count('git_cache.miss')
+
+    # Processes rendering in the same repository share one git status run.
+    with CacheLock(f"git-{lock_id(key)}", LOCK_TIMEOUT) as lock:
+        if lock.contended:
+            stored = (load_cache(GIT_CACHE_FILE) or {}).get('repos', {})
+            with _git_cache_lock:
+                _git_cache.update(stored)
+                entry = _git_cache.get(key)
+            if git_cache_fresh(entry, git_dir, toplevel, max_age) or (entry and not lock.acquired):
+                return entry['result']
+
+        max_files = get_env_int('CLAUDE_STATUSLINE_GIT_MAX_FILES', 0, env)
+        with_numstat = not (max_files and git_dir and git_index_entries(git_dir) > max_files)
+        numstat_file = NUMSTAT_FILE.format(lock_id(key))
+        # The daemon keeps the counts in memory; one-shot runs load them.
+        previous = entry.get('numstat') if entry else None
+        if previous is None and with_numstat:
+            previous = (load_cache(numstat_file) or {}).get('files')
+        result, dirty, numstat = query_git_status(cwd, toplevel, git_dir, with_numstat, previous)
+        if numstat is not None and numstat != previous:
+            save_cache(numstat_file, {'files': numstat})
+        # Fingerprint after the query: git status may itself refresh the index.
+        fingerprint = git_fingerprint(git_dir) if git_dir and result else None
+        if fingerprint:
+            dirty = dirty[:GIT_DIRTY_STAT_LIMIT]
+            entry = {
+                'time': time.time(),
+                'fingerprint': fingerprint,
+                'dirty': dirty,
+                'dirty_stat': [stat_key(toplevel / path) for path in dirty],
+                'result': result,
+            }
+            # Merge into the file: other repositories' entries may be newer there.
+            stored = (load_cache(GIT_CACHE_FILE) or {}).get('repos', {})
+            with _git_cache_lock:
+                evicted = False
+                for repos in (stored, _git_cache):
+                    for stale_key in [k for k, e in repos.items() if entry['time'] - e['time'] > GIT_CACHE_MAX_AGE]:
+                        del repos[stale_key]
+                        evicted = True
+                stored[key] = entry
+                _git_cache[key] = dict(entry, numstat=numstat)
+                save_cache(GIT_CACHE_FILE, {'repos': stored})
+            if evicted:
+                remove_repo_files(stored)
+    return result
+
+
+def remove_repo_files(repos: Dict[str, Any]) -> None:
+    """Delete the lock and numstat files of repositories other than repos."""
+    patterns = ('git-{}.lock', 'pr-{}.lock', NUMSTAT_FILE)
+    keep = {pattern.format(lock_id(key)) for key in repos for pattern in patterns}
+    cache_dir = get_cache_dir()
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        if (name.startswith(('git-', 'pr-')) and name.endswith('.lock')
+                or name.startswith('numstat-') and name.endswith('.json')) and name not in keep:
+            try:
+                os.unlink(cache_dir / name)
+            except OSError:
+                pass
+
+
+def git_cache_fresh(entry: Optional[Dict[str, Any]], git_dir: Optional[Path], toplevel: Path, max_age: int) -> bool:
+    """True if a git cache entry is young enough and its repository unchanged."""
+    return bool(
+        entry and git_dir and time.time() - entry['time'] < max_age
+        and entry['fingerprint'] == git_fingerprint(git_dir)
+        and entry['dirty_stat'] == [stat_key(toplevel / path) for path in entry['dirty']]
+    )
+
+
+def query_git_status(cwd, toplevel: Path, git_dir: Optional[Path], with_numstat: bool = True,
+                     numstat: Optional[Dict[str, list]] = None) -> tuple:
+    """Run one `git status` and (optionally) `git diff --numstat` for changed files.
+
+    Branch, HEAD commit and upstream remote are read from the files under
+    git_dir (see read_git_head); only when that fails does `git status`
+    report the branch as well. numstat holds the per-file line counts of the
+    previous call (see git_line_stats).
+
+    Returns (result, dirty, numstat): the dict described in
+    collect_git_status (or None), the repo-relative paths of changed files
+    and the updated per-file line counts.
+    """
+    head_info = read_git_head(git_dir) if git_dir else None
+    # Untracked files are never displayed, so don't make git scan for them.
+    status_args = ["git", "status", "--porcelain=v2", "-z", "--untracked-files=no"]
+    if head_info is None:
+        status_args.append("--branch")
+    status_output = run_cmd(status_args, cwd=cwd, check=True)
+    if status_output is None:
+        return None, [], numstat
+
+    oid = head = None
+    if head_info:
+        head = head_info[0] or '(detached)'
+        oid = head_info[1] or '(initial)'
+    modified = added = deleted = 0
+    dirty = []
+    # (path, original path of a rename or None, HEAD blob, index blob)
+    changes = []
+    records = iter(status_output.split('\0'))
+    for record in records:
+        if record.startswith('# branch.oid '):
+            oid = record[len('# branch.oid '):]
+        elif record.startswith('# branch.head '):
+            head = record[len('# branch.head '):]
+        elif record[:2] in ('1 ', '2 ', 'u '):
+            status = record[2:4]
+            if 'M' in status:
+                modified += 1
+            if 'A' in status:
+                added += 1
+            if 'D' in status:
+                deleted += 1
+            # Path is the last field: after 8 fields ("1"), 9 ("2") or 10 ("u");
+            # fields 7 and 8 of "1" and "2" are the HEAD and index blob ids.
+            fields = record.split(' ', {'1': 8, '2': 9, 'u': 10}[record[0]])
+            dirty.append(fields[-1])
+            if record[0] == 'u':
+                changes.append((fields[-1], None, None, None))  # unmerged: always diffed
+            elif record[0] == '2':
+                # rename/copy: original path follows
+                changes.append((fields[-1], next(records, None), fields[6], fields[7]))
+            else:
+                changes.append((fields[-1], None, fields[6], fields[7]))
+
+    # Current branch, or short sha for a detached HEAD
+    if head and head != '(detached)':
+        branch = head
+    elif oid and oid != '(initial)':
+        branch = oid[:7]
+    else:
+        branch = "detached"
+
+    # The remote of the tracked upstream, with fallbacks (see git_branch_remote)
+    config = read_git_config(find_git_common_dir(git_dir) / 'config') if git_dir else {}
+    remote = git_branch_remote(config, head if head != '(detached)' else None)
+
+    # Line changes (staged + unstaged); a repo without commits has no HEAD to diff against
+    total_added = total_removed = 0
+    if with_numstat:
+        diff_args = ["--cached"] if oid == '(initial)' else ["HEAD"]
+        numstat = git_line_stats(cwd, toplevel, changes, diff_args, numstat or {})
+        for _, lines_added, lines_removed in numstat.values():
+            total_added += lines_added
+            total_removed += lines_removed
+
+    return {
+        'toplevel': str(toplevel),
+        'branch': branch,
+        'head': oid if oid != '(initial)' else None,
+        'remote': remote,
+        'added': added,
+        'modified': modified,
+        'deleted': deleted,
+        'lines_added': total_added,
+        'lines_removed': total_removed,
+    }, dirty, numstat
+
+
+def git_line_stats(cwd, toplevel: Path, changes: List[tuple], diff_args: List[str],
+                   previous: Dict[str, list]) -> Dict[str, list]:
+    """Per-file +/- line counts of changes (see query_git_status), reusing previous.
+
+    Returns {path: [key, added, removed]}, where key is the file's worktree
+    stat and HEAD and index blob ids. Files whose key is unchanged since the
+    previous call keep their counts; only the others are passed to
+    `git diff --numstat` as pathspecs, so the cost follows what changed
+    since the last refresh, not the size of the dirty tree.
+    """
+    stats = {}
+    stale = []
+    owner = {}  # diffed path -> the path its counts belong to
+    for path, orig, head_blob, index_blob in changes:
+        key = None if head_blob is None else [stat_key(toplevel / path), head_blob, index_blob, orig]
+        cached = previous.get(path)
+        if key is not None and cached and cached[0] == key:
+            stats[path] = cached
+        else:
+            stats[path] = [key, 0, 0]
+            # Both sides of a rename go into one diff, so it is still
+            # detected; if git sees a delete and an add instead, both count.
+            stale.append((path, orig) if orig else (path,))
+            owner[path] = path
+            if orig:
+                owner.setdefault(orig, path)
+    count('git.numstat_reused', len(stats) - len(stale))
+    count('git.numstat_diffed', len(stale))
+
+    for start in range(0, len(stale), NUMSTAT_BATCH):
+        batch = [path for group in stale[start:start + NUMSTAT_BATCH] for path in group]
+        output = run_cmd(["git", "--literal-pathspecs", "diff", "--numstat", "-z", *diff_args, "--", *batch],
+                         cwd=cwd, check=True)
+        if output is None:
+            # Unknown counts are not cached: diff these files again next time.
+            for path in batch:
+                stats[owner[path]][0] = None
+            continue
+        # "added<TAB>removed<TAB>path" records; renames have an empty path
+        # followed by the original and the new path.
+        fields = iter(output.split('\0'))
+        for record in fields:
+            parts = record.split('\t', 2)
+            if len(parts) < 3:
+                continue
+            path = parts[2]
+            if not path:
+                next(fields, None)
+                path = next(fields, '')
+            if path in owner:
+                counts = stats[owner[path]]
+                counts[1] += int(parts[0]) if parts[0].isdigit() else 0
+                counts[2] += int(parts[1]) if parts[1].isdigit() else 0
+    return stats
+
+
+def git_segment(git: Dict[str, Any]) -> 'Segment':
+    """Layout segment 'remote/branch A1 M2 D3 +10 -4'; the branch name shrinks."""
+    # Build status string with colored badges
+    # ANSI color codes for backgrounds with bold white text
+    GREEN_BG = '\033[42m\033[1;97m'  # Green background, bold white text
+    ORANGE_BG = '\033[48;5;208m\033[1;97m'  # Orange background, bold white text
+    RED_BG = '\033[41m\033[1;97m'  # Red background, bold white text
+    RESET = '\033[0m'
+
+    status_parts = []
+    if git['added']:
+        status_parts.append(f"{GREEN_BG}A{git['added']}{RESET}")
+    if git['modified']:
+        status_parts.append(f"{ORANGE_BG}M{git['modified']}{RESET}")
+    if git['deleted']:
+        status_parts.append(f"{RED_BG}D{git['deleted']}{RESET}")
+
+    status_str = " ".join(status_parts) if status_parts else ""
+
+    # Add line changes with bold colors
+    BOLD_GREEN = '\033[1;32m'  # Bold green
+    BOLD_RED = '\033[1;31m'  # Bold red
+    RESET_LINE = '\033[0m'
+
+    changes = []
+    if git['lines_added']:
+        changes.append(f"{BOLD_GREEN}+{git['lines_added']}{RESET_LINE}")
+    if git['lines_removed']:
+        changes.append(f"{BOLD_RED}-{git['lines_removed']}{RESET_LINE}")
+    changes_str = " ".join(changes)
+
+    # Combine everything after the (truncatable) branch name
+    suffix = "".join(f" {part}" for part in (status_str, changes_str) if part)
+
+    return Segment(f"{git['remote']}/", git['branch'], suffix, *BRANCH_BUDGET)
+
+
+def format_git_info(git: Dict[str, Any], max_branch_len=60) -> str:
+    """Format collected git state as 'remote/branch A1 M2 D3 +10 -4'."""
+    return git_segment(git).render(max_branch_len)
+
+
+def get_git_info(cwd, max_branch_len=60):
+    """Get git repository information as a display string."""
+    git = collect_git_status(cwd)
+    if not git:
+        return None
+    return format_git_info(git, max_branch_len)
+
+
+def fetch_pr_data(cwd):
+    """Fetch raw PR data once (number and title). Returns (number, title) or None."""
+    pr_info = run_cmd(["gh", "pr", "view", "--json", "number,title"], cwd=cwd)
+    if not pr_info:
+        return None
+    try:
+        pr_data = json.loads(pr_info)
+        return pr_data.get('number'), pr_data.get('title', '')
+    except (json.JSONDecodeError, KeyError, AttributeError):
+        return None
+
+
+# PR lookups: "toplevel\0branch\0HEAD sha" -> [fetched_at, (number, title) or None],
+# plus the time until which gh is known to be missing.
+_pr_cache: Optional[Dict[str, Any]] = None
+_pr_cache_lock = threading.Lock()
+
+
+def get_pr_data(cwd, git_job) -> Optional[tuple]:
+    """PR (number, title) of the current branch, served from a stale-while-revalidate cache.
+
+    Entries are keyed by repository, branch and HEAD commit. Fresh entries,
+    including negative ones for "no PR" and "gh not installed", are returned
+    without running anything. On the render path an expired entry is served
+    stale while a detached refresh process fetches the new one; the daemon
+    and the refresh process fetch synchronously.
+    """
+    git_job.done.wait()
+    git = git_job.value
+    if not git:
+        return None
+    global _pr_cache
+    key = '\0'.join((git['toplevel'], git['branch'], git['head'] or ''))
+    now = time.time()
+    with _pr_cache_lock:
+        if _pr_cache is None:
+            _pr_cache = load_cache(PR_CACHE_FILE) or {'entries': {}, 'gh_missing_until': 0}
+        if _pr_cache['gh_missing_until'] > now:
+            return None
+        entry = _pr_cache['entries'].get(key)
+    if entry:
+        fetched_at, value = entry
+        if now - fetched_at < (PR_CACHE_TTL if value else PR_NEGATIVE_TTL):
+            count('pr_cache.hit')
+            return value
+    count('pr_cache.stale' if entry else 'pr_cache.miss')
+    if not _background:
+        spawn_refresh(cwd, only='pr')
+        return entry[1] if entry else None
+
+    # One gh call per repository at a time, whichever process gets there first.
+    with CacheLock(f"pr-{lock_id(git['toplevel'])}", LOCK_TIMEOUT) as lock:
+        if lock.contended:
+            stored = load_cache(PR_CACHE_FILE) or {}
+            entry = stored.get('entries', {}).get(key) or entry
+            if entry and (not lock.acquired
+                          or time.time() - entry[0] < (PR_CACHE_TTL if entry[1] else PR_NEGATIVE_TTL)):
+                return entry[1]
+
+        from shutil import which
+        gh_found = which('gh') is not None
+        value = fetch_pr_data(cwd) if gh_found else None
+        now = time.time()
+        stored = load_cache(PR_CACHE_FILE) or {'entries': {}, 'gh_missing_until': 0}
+        with _pr_cache_lock:
+            # Merge into the file: other processes may have added entries.
+            _pr_cache['entries'].update(stored['entries'])
+            if not gh_found:
+                _pr_cache['gh_missing_until'] = now + GH_MISSING_TTL
+            entries = _pr_cache['entries']
+            entries[key] = [now, value]
+            for stale_key in [k for k, (fetched_at, _) in entries.items() if now - fetched_at > PR_CACHE_MAX_AGE]:
+                del entries[stale_key]
+            save_cache(PR_CACHE_FILE, _pr_cache)
+    return value
+
+
+def pr_segment(pr_data) -> Optional['Segment']:
+    """Layout segment 'PR#123: title'; the title shrinks."""
+    if not pr_data:
+        return None
+    number, title = pr_data
+    return Segment(f"PR#{number}: ", title, '', *PR_TITLE_BUDGET)
+
+
+def progress_bar(percentage, width=8):
+    """
+    Create an ASCII progress bar with color coding.
+
+    Args:
+        percentage: Value from 0-100
+        width: Width of the progress bar in characters (default 8)
+
+    Returns:
+        Colored ASCII progress bar string
+    """
+    # ANSI color codes
+    RESET = '\033[0m'
+    GREEN = '\033[32m'
+    ORANGE = '\033[38;5;208m'
+    RED = '\033[91m'
+
+    # Choose color based on percentage
+    if percentage >= 90:
+        color = RED
+    elif percentage >= 80:
+        color = ORANGE
+    else:
+        color = GREEN
+
+    # Calculate filled and empty portions.
+    # Clamp to [0, width] so a percentage >100% (over budget) renders a full
+    # bar instead of overflowing and breaking the statusline layout.
+    filled = max(0, min(width, int((percentage / 100) * width)))
+    empty = width - filled
+
+    # Use Unicode block characters for smooth progress
+    bar = '█' * filled + '░' * empty
+
+    return f"{color}{bar}{RESET}"
+
+
+# Resolved configuration (the effort setting), reused while the stat results
+# of the files it was derived from are unchanged; this pays off in the
+# daemon and watch mode, which render many times per process.
+_config_cache: Dict[str, tuple] = {}
+
+
+def cached_config(name: str, paths: List[Path], compute):
+    """compute(), memoized under name until the stat results of paths change."""
+    key = [stat_key(path) for path in paths]
+    cached = _config_cache.get(name)
+    if cached and cached[0] == key:
+        count('config_cache.hit')
+        return cached[1]
+    count('config_cache.miss')
+    value = compute()
+    _config_cache[name] = (key, value)
+    return value
+
+
+def get_claude_data_path() -> Optional[Path]:
+    """Find Claude data directory."""
+    # Check env override
+    env_dir = os.environ.get("CLAUDE_CONFIG_DIR")
+    if env_dir:
+        env_path = Path(env_dir).expanduser()
+        base = env_path if env_path.name == ".claude" else env_path / ".claude"
+        candidates = [base / "projects"]
+        fallback = base
+    else:
+        # Check standard locations
+        candidates = [
+            Path.home() / '.claude' / 'projects',
+            Path.home() / '.config' / 'claude' / 'projects',
+            Path.home() / '.claude',
+        ]
+        fallback = None
+
+    # Not worth caching: checking a cached answer would stat the same paths.
+    return next((path for path in candidates if path.is_dir()), fallback)
+
+
+def get_cache_dir() -> Path:
+    """Directory for persistent statusline caches (usage index etc.)."""
+    env_dir = os.environ.get("CLAUDE_STATUSLINE_CACHE_DIR")
+    if env_dir:
+        return Path(env_dir).expanduser()
+    xdg = os.environ.get("XDG_CACHE_HOME")
+    base = Path(xdg).expanduser() if xdg else Path.home() / '.cache'
+    return base / 'claude-statusline'
+
+
+def load_cache(name: str) -> Optional[Dict[str, Any]]:
+    """Load a JSON cache file, or None if missing, corrupt or from another version."""
+    try:
+        with open(get_cache_dir() / name, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+        return None
+    return data
+
+
+def save_cache(name: str, data: Dict[str, Any]) -> None:
+    """Atomically write a JSON cache file (temp file + rename).
+
+    Several statusline processes may run at once; the rename guarantees a
+    reader sees either the old or the new file, never a partial one.
+    """
+    cache_dir = get_cache_dir()
+    tmp_path = cache_dir / f".{name}.{os.getpid()}.tmp"
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(data, version=CACHE_VERSION), f, separators=(',', ':'))
+        os.replace(tmp_path, cache_dir / name)
+    except OSError:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+
+
+class CacheLock:
+    """Advisory lock shared by all statusline processes (flock on a file in the cache dir).
+
+    Use as a context manager. acquired is False if another process held the
+    lock for longer than timeout seconds; contended is True if we had to
+    wait, i.e. another process may just have refreshed the guarded data.
+    Without flock (or a writable cache dir) the lock is always acquired.
+    """
+
+    def __init__(self, name: str, timeout: float):
+        self.path = get_cache_dir() / f"{name}.lock"
+        self.timeout = timeout
+        self.fd = None
+        self.acquired = True
+        self.contended = False
+
+    def __enter__(self):
+        try:
+            import fcntl
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        except (ImportError, OSError):
+            return self
+        end = time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return self
+            except BlockingIOError:
+                self.contended = True
+            except OSError:
+                return self
+            if time.monotonic() >= end:
+                self.acquired = False
+                return self
+            time.sleep(LOCK_POLL_INTERVAL)
+
+    def __exit__(self, *exc_info):
+        if self.fd is not None:
+            os.close(self.fd)  # releases the lock
+            self.fd = None
+
+
+def lock_id(key: str) -> str:
+    """Short file-name-safe id of a cache key, for per-repository lock files."""
+    return f"{binascii.crc32(key.encode('utf-8')):08x}"
+
+
+def parse_timestamp(timestamp_str: str) -> float:
+    """Epoch seconds of an ISO 8601 timestamp.
+
+    Transcripts use the fixed form 2025-01-31T12:34:56.789Z, so the epoch of
+    each minute is computed once and the seconds are added to it.
+    """
+    if len(timestamp_str) > 17 and timestamp_str[-1] == 'Z' and timestamp_str[16] == ':':
+        minute = timestamp_str[:16]
+        epoch = _minute_epochs.get(minute)
+        if epoch is None:
+            if len(_minute_epochs) > 100_000:
+                _minute_epochs.clear()
+            epoch = _minute_epochs[minute] = datetime.fromisoformat(minute + '+00:00').timestamp()
+        return epoch + float(timestamp_str[17:-1])
+    if timestamp_str.endswith('Z'):
+        timestamp_str = timestamp_str[:-1] + '+00:00'
+    return datetime.fromisoformat(timestamp_str).timestamp()
+
+
+_minute_epochs: Dict[str, float] = {}
+
+
+def load_pricing() -> List[tuple]:
+    """Pricing table: CLAUDE_STATUSLINE_PRICING overrides, then MODEL_PRICING."""
+    table = []
+    path = os.environ.get('CLAUDE_STATUSLINE_PRICING')
+    if path:
+        try:
+            with open(Path(path).expanduser(), encoding='utf-8') as f:
+                table = [(pattern, tuple(map(float, rates))) for pattern, rates in json.load(f).items()]
+        except (OSError, ValueError, TypeError, AttributeError):
+            table = []
+    return table + list(MODEL_PRICING)
+
+
+_pricing: Optional[List[tuple]] = None
+_model_rates: Dict[str, tuple] = {}
+
+
+def model_pricing(model: str) -> tuple:
+    """Rates of TOKEN_TYPES in dollars per million tokens for a model name."""
+    rates = _model_rates.get(model)
+    if rates is None:
+        global _pricing
+        if _pricing is None:
+            _pricing = load_pricing()
+        rates = next((r for pattern, r in _pricing if pattern in model and len(r) == 4), DEFAULT_PRICING)
+        _model_rates[model] = rates
+    return rates
+
+
+def use_fast_json() -> None:
+    """Decode transcript lines with orjson, if installed.
+
+    orjson is several times faster than json on large transcript lines, but
+    takes milliseconds to import, so it is loaded only once transcripts are
+    actually parsed.
+    """
+    global json_loads, _fast_json_checked
+    if not _fast_json_checked:
+        _fast_json_checked = True
+        try:
+            from orjson import loads as json_loads
+        except ImportError:
+            pass
+
+
+def parse_usage_line(line: bytes) -> Optional[tuple]:
+    """Parse one transcript line into an entry, or None.
+
+    Entries are (epoch_seconds, cost, *token counts in TOKEN_TYPES order,
+    model name).
+    """
+    # Most lines (user messages, tool results) carry no usage; reject them
+    # with a byte search instead of decoding them.
+    if USAGE_MARKER not in line or TIMESTAMP_MARKER not in line:
+        return None
+    try:
+        fields = slice_usage_fields(line) or decode_usage_fields(line)
+        if not fields:
+            return None
+        timestamp_str, usage, model = fields
+
+        counts = tuple(usage.get(field) or 0 for field in USAGE_FIELDS)
+        if not any(counts[:3]):
+            return None
+
+        cost = sum(n * rate for n, rate in zip(counts, model_pricing(model))) / 1000000
+
+        return (parse_timestamp(timestamp_str), cost, *counts, model)
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+def decode_usage_fields(line: bytes) -> Optional[tuple]:
+    """(timestamp, usage, model) of a transcript line, decoding all of it; None without usage."""
+    data = json_loads(line)
+    timestamp_str = data.get('timestamp', '')
+    if not timestamp_str:
+        return None
+    message = data.get('message')
+    if not isinstance(message, dict):
+        message = {}
+    usage = data.get('usage') or message.get('usage')
+    if not usage:
+        return None
+    return timestamp_str, usage, message.get('model') or ''
+
+
+def slice_usage_fields(line: bytes) -> Optional[tuple]:
+    """(timestamp, usage, model) of an assistant line, decoding only the usage object.
+
+    Relies on the layout in MESSAGE_MODEL_KEY's comment, so the values are
+    found near the start and, searching backwards, near the end of the
+    line, whatever the message content holds. Lines in another layout give
+    None, and the caller decodes them whole.
+    """
+    i = line.find(b'"message":{')
+    if i < 0 or not line.startswith(MESSAGE_MODEL_KEY, i):
+        return None
+    i += len(MESSAGE_MODEL_KEY)
+    j = line.find(b'"', i)
+    start = line.rfind(USAGE_KEY)
+    if j < 0 or start < j:
+        return None
+    start += len(USAGE_KEY) - 1
+    # The usage object nests a level deep (cache_creation) and its strings
+    # (service_tier) hold no braces: its end is the first } that balances.
+    end = line.find(b'}', start)
+    while end >= 0 and line.count(b'{', start, end) > line.count(b'}', start, end) + 1:
+        end = line.find(b'}', end + 1)
+    # It must close the message, too.
+    if end < 0 or line[end + 1:end + 2] != b'}':
+        return None
+    t = line.rfind(TIMESTAMP_KEY, end)
+    if t < 0:
+        return None
+    t += len(TIMESTAMP_KEY)
+    u = line.find(b'"', t)
+    model = line[i:j]
+    timestamp = line[t:u]
+    if u < 0 or b'\\' in model or b'\\' in timestamp:
+        return None
+    try:
+        usage = json_loads(line[start:end + 1])
+        return timestamp.decode('ascii'), usage, model.decode('utf-8')
+    except ValueError:
+        return None
+
+
+def iter_usage_lines(buf: bytes):
+    """Yield the lines of buf that mention usage, without splitting the others out."""
+    find = buf.find
+    pos = 0
+    while True:
+        i = find(USAGE_MARKER, pos)
+        if i < 0:
+            return
+        start = buf.rfind(b'\n', pos, i) + 1 or pos
+        end = find(b'\n', i)
+        if end < 0:
+            end = len(buf)
+        yield buf[start:end]
+        pos = end + 1
+
+
+def read_entries_forward(f, offset: int, cutoff: float, entries: List[tuple]) -> int:
+    """Append usage entries from the complete lines after offset; return the new offset."""
+    f.seek(offset)
+    chunk = f.read()
+    # Only consume complete lines; a trailing partial line is still being written.
+    end = chunk.rfind(b'\n') + 1
+    for line in iter_usage_lines(chunk[:end]):
+        entry = parse_usage_line(line)
+        if entry and entry[0] >= cutoff:
+            entries.append(entry)
+    return offset + end
+
+
+def read_usage_lines_reversed(f, end: int, block_size: int = REVERSE_BLOCK_SIZE):
+    """Yield the usage lines of binary file f before byte offset end, last line first.
+
+    end must be at a line boundary.
+    """
+    pos = end
+    pending = []  # later parts of a line that starts in an earlier block
+    while pos > 0:
+        size = min(block_size, pos)
+        pos -= size
+        f.seek(pos)
+        block = f.read(size)
+        nl = block.find(b'\n') if pos > 0 else -1
+        if pos > 0 and nl < 0:
+            pending.append(block)
+            continue
+        complete = block[nl + 1:] + b''.join(reversed(pending))
+        pending = [block[:nl]] if pos > 0 else []
+        yield from reversed(list(iter_usage_lines(complete)))
+
+
+def find_last_newline(f, size: int) -> int:
+    """Offset just past the last newline of binary file f (0 if there is none)."""
+    pos = size
+    while pos > 0:
+        start = max(0, pos - REVERSE_BLOCK_SIZE)
+        f.seek(start)
+        nl = f.read(pos - start).rfind(b'\n')
+        if nl >= 0:
+            return start + nl + 1
+        pos = start
+    return 0
+
+
+def read_entries_reversed(f, size: int, cutoff: float, entries: List[tuple]) -> int:
+    """Append usage entries of a whole file, reading backwards from its end.
+
+    Transcripts are appended in time order, so the scan stops at the first
+    usage entry older than cutoff (less TIMESTAMP_SLACK for slightly
+    out-of-order lines) and never touches older bytes. Returns the offset
+    just past the last complete line.
+    """
+    end = find_last_newline(f, size)
+    found = []
+    for line in read_usage_lines_reversed(f, end):
+        entry = parse_usage_line(line)
+        if not entry:
+            continue
+        if entry[0] < cutoff - TIMESTAMP_SLACK:
+            break
+        if entry[0] >= cutoff:
+            found.append(entry)
+    entries.extend(reversed(found))
+    return end
+
+
+def walk_transcripts(directory: str, cutoff: float, found: List[tuple]) -> None:
+    """Append (path, stat) of every *.jsonl below directory modified after cutoff."""
+    try:
+        with os.scandir(directory) as it:
+            entries = list(it)
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                walk_transcripts(entry.path, cutoff, found)
+            elif entry.name.endswith('.jsonl') and entry.is_file():
+                st = entry.stat()
+                if st.st_mtime >= cutoff - TIMESTAMP_SLACK:
+                    found.append((entry.path, st))
+        except OSError:
+            continue
+
+
+def scan_transcripts(data_path: Path, cutoff: float, dirs: Dict[str, Any]) -> tuple:
+    """Find transcripts under data_path that may hold entries newer than cutoff.
+
+    Files last modified before cutoff are skipped without being opened.
+    dirs remembers, per top-level (project) directory, its mtime and
+    whether it held any recent transcript; a cold directory is skipped
+    entirely until its mtime changes or COLD_DIR_RECHECK seconds passed.
+
+    Returns (transcripts, dirs): a list of (path, stat_result) and the
+    updated directory state.
+    """
+    now = time.time()
+    found = []
+    scanned = {}
+    try:
+        with os.scandir(data_path) as it:
+            entries = list(it)
+    except OSError:
+        return found, scanned
+    for entry in entries:
+        try:
+            if not entry.is_dir(follow_symlinks=False):
+                if entry.name.endswith('.jsonl') and entry.is_file():
+                    st = entry.stat()
+                    if st.st_mtime >= cutoff - TIMESTAMP_SLACK:
+                        found.append((entry.path, st))
+                continue
+            mtime = entry.stat(follow_symlinks=False).st_mtime_ns
+        except OSError:
+            continue
+        state = dirs.get(entry.path)
+        if state and not state['hot'] and state['mtime'] == mtime and now - state['checked'] < COLD_DIR_RECHECK:
+            scanned[entry.path] = state
+            continue
+        before = len(found)
+        walk_transcripts(entry.path, cutoff, found)
+        hot = len(found) > before
+        # Only cold directories need the time of their last check.
+        scanned[entry.path] = {'mtime': mtime, 'hot': hot, 'checked': 0 if hot else now}
+    return found, scanned
+
+
+def index_transcript(path: str, offset: int, size: int, cutoff: float) -> Optional[tuple]:
+    """Parse a transcript from offset (0: the whole file, backwards).
+
+    Returns (new_offset, entries), or None if the file can't be read.
+    """
+    use_fast_json()
+    entries = []
+    try:
+        with open(path, 'rb') as f:
+            if offset == 0:
+                end = read_entries_reversed(f, size, cutoff, entries)
+            else:
+                end = read_entries_forward(f, offset, cutoff, entries)
+    except OSError:
+        return None
+    return end, entries
+
+
+def index_transcripts(pending: List[tuple], cutoff: float) -> List[Optional[tuple]]:
+    """index_transcript() for every (path, stat, index record) in pending.
+
+    Small updates run in this process. Once more than PARALLEL_SCAN_BYTES
+    are to be read, as on a cold start, background processes spread the
+    files over a process pool, largest first; a one-shot render would have to
+    wait for the pool at exit, long after printing its line.
+    """
+    jobs = [(path, rec['offset'], st.st_size, cutoff) for path, st, rec in pending]
+    todo = sum(size - offset for _, offset, size, _ in jobs)
+    workers = min(os.cpu_count() or 1, PARALLEL_SCAN_WORKERS, len(jobs))
+    if _background and todo >= PARALLEL_SCAN_BYTES and workers > 1:
+        order = sorted(range(len(jobs)), key=lambda i: jobs[i][2] - jobs[i][1], reverse=True)
+        try:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # spawn, not fork: the daemon and the renderer are multi-threaded.
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                results = list(pool.map(index_transcript, *zip(*(jobs[i] for i in order))))
+        except Exception:
+            pass  # no usable process pool here: parse serially below
+        else:
+            merged = [None] * len(jobs)
+            for i, result in zip(order, results):
+                merged[i] = result
+            return merged
+    return [index_transcript(*job) for job in jobs]
+
+
+def update_usage_index(index: Dict[str, Any], data_path: Path, cutoff: float,
+                       window_cutoff: Optional[float] = None) -> bool:
+    """Bring the usage index up to date with the transcripts under data_path.
+
+    Transcripts are append-only, so for every file the index remembers its
+    inode, size, mtime and the byte offset up to which it has been parsed,
+    together with the parsed entries in time-ordered columns (see
+    new_entry_columns). Only bytes appended since the last call are parsed,
+    and only files modified after cutoff are considered at all (see
+    scan_transcripts). A file that shrank,
+    was rewritten in place or replaced (new inode) is re-parsed from the start.
+    Entries older than cutoff (epoch seconds) are dropped.
+
+    With a window_cutoff, every file also keeps per-minute rows back to it
+    (see append_window_entries), from the same scan.
+
+    Returns True if the index changed and should be saved.
+    """
+    scan_cutoff = cutoff if window_cutoff is None else min(cutoff, window_cutoff)
+    files = index.setdefault('files', {})
+    dirs = index.setdefault('dirs', {})
+    transcripts, scanned_dirs = scan_transcripts(data_path, scan_cutoff, dirs)
+    changed = scanned_dirs != dirs
+    index['dirs'] = scanned_dirs
+    seen = set()
+    pending = []
+    for key, st in transcripts:
+        seen.add(key)
+        rec = files.get(key)
+        if rec and rec['ino'] == st.st_ino and rec['size'] == st.st_size and rec['mtime'] == st.st_mtime_ns:
+            continue
+        if (not rec or rec['ino'] != st.st_ino or st.st_size < rec['offset']
+                or (st.st_size == rec['size'] and st.st_mtime_ns != rec['mtime'])):
+            rec = dict(new_entry_columns(), ino=st.st_ino, offset=0)
+            if window_cutoff is not None:
+                rec['window'] = new_window_columns()
+        pending.append((key, st, rec))
+
+    count('usage.files_unchanged', len(transcripts) - len(pending))
+    count('usage.files_read', len(pending))
+    for (key, st, rec), result in zip(pending, index_transcripts(pending, scan_cutoff)):
+        if result is None:
+            continue
+        count('usage.bytes_indexed', result[0] - rec['offset'])
+        count('usage.entries_parsed', len(result[1]))
+        rec['offset'], new_entries = result
+        append_entries(rec, new_entries)
+        if window_cutoff is not None:
+            append_window_entries(rec['window'], new_entries)
+        rec['size'] = st.st_size
+        rec['mtime'] = st.st_mtime_ns
+        files[key] = rec
+        changed = True
+
+    for key in list(files):
+        if key not in seen:
+            del files[key]
+            changed = True
+    if window_cutoff is not None:
+        changed = prune_window_index(index, window_cutoff) or changed
+    return prune_usage_index(index, cutoff) or changed
+
+
+def new_entry_columns() -> Dict[str, Any]:
+    """Empty per-file entry storage: the ENTRY_COLUMNS arrays plus 'models',
+    the model names that the 'model' column indexes."""
+    return dict({column: array(code) for column, code in ENTRY_COLUMNS}, models=[])
+
+
+def append_entries(rec: Dict[str, Any], entries: List[tuple]) -> None:
+    """Append parsed entries (see parse_usage_line) to a file's columns, keeping them time-ordered."""
+    if not entries:
+        return
+    ts = rec['ts']
+    if (ts and entries[0][0] < ts[-1]) or any(a[0] > b[0] for a, b in zip(entries, entries[1:])):
+        # Rare out-of-order lines: re-sort this one file.
+        models = rec['models']
+        old = zip(*(rec[column] for column, _ in ENTRY_COLUMNS[:-1]), (models[i] for i in rec['model']))
+        entries = sorted([*old, *entries])
+        rec.update(new_entry_columns())
+    models = rec['models']
+    model_ids = {name: i for i, name in enumerate(models)}
+    *values, names = zip(*entries)
+    for name in dict.fromkeys(names):
+        if name not in model_ids:
+            model_ids[name] = len(models)
+            models.append(name)
+    values.append([model_ids[name] for name in names])
+    for (column, _), column_values in zip(ENTRY_COLUMNS, values):
+        rec[column].extend(column_values)
+
+
+def prune_usage_index(index: Dict[str, Any], cutoff: float) -> bool:
+    """Drop indexed entries older than cutoff. Returns True if anything was dropped."""
+    changed = False
+    for rec in index.get('files', {}).values():
+        i = bisect_left(rec['ts'], cutoff)
+        if i:
+            for column, _ in ENTRY_COLUMNS:
+                del rec[column][:i]
+            changed = True
+    return changed
+
+
+def iter_entries_since(index: Dict[str, Any], start: Optional[float]):
+    """Stream indexed (ts, tokens, cost) entries from start on, in time order.
+
+    tokens counts all TOKEN_TYPES but cache reads. Each file's columns are
+    already sorted, so the files are combined with a lazy k-way merge
+    instead of collecting and sorting every entry.
+    """
+    streams = []
+    for rec in index['files'].values():
+        first = 0 if start is None else bisect_left(rec['ts'], start)
+        if first < len(rec['ts']):
+            tokens = map(lambda a, b, c: a + b + c, rec['input'], rec['output'], rec['cache_creation'])
+            streams.append(islice(zip(rec['ts'], tokens, rec['cost']), first, None))
+    return heapq.merge(*streams)
+
+
+def new_usage_totals() -> Dict[str, float]:
+    """Zeroed usage totals: messages, tokens (as counted for sessions), cost and TOKEN_TYPES."""
+    return dict.fromkeys(('messages', 'tokens', 'cost', *TOKEN_TYPES), 0)
+
+
+def sum_window_rows(rec: Dict[str, Any], lo: int, hi: int) -> Dict[str, Dict[str, float]]:
+    """Usage totals per model of a file's window rows lo..hi-1."""
+    columns = ('cost', *TOKEN_TYPES, 'messages')
+    models = rec['models']
+    if len(models) == 1:
+        groups = {models[0]: dict(new_usage_totals(), **{column: sum(rec[column][lo:hi]) for column in columns})}
+    else:
+        groups = {}
+        model_ids = rec['model']
+        for i in range(lo, hi):
+            totals = groups.get(models[model_ids[i]])
+            if totals is None:
+                totals = groups[models[model_ids[i]]] = new_usage_totals()
+            for column in columns:
+                totals[column] += rec[column][i]
+    for totals in groups.values():
+        totals['tokens'] = totals['input'] + totals['output'] + totals['cache_creation']
+    return groups
+
+
+def aggregate_usage(index: Dict[str, Any], now: float) -> Dict[str, Dict[str, Any]]:
+    """Usage over each of USAGE_WINDOWS with breakdowns, in one pass over the window rows.
+
+    Returns {window: {'total': totals, 'model': {name: totals},
+    'project': {directory: totals}}} (see new_usage_totals). The windows
+    are nested, so each file is cut at the window starts and every stretch
+    between two cuts is summed once, then added to all windows holding it.
+    """
+    windows = sorted(USAGE_WINDOWS, key=lambda window: -window[1])
+    result = {name: {'total': new_usage_totals(), 'model': {}, 'project': {}} for name, _ in USAGE_WINDOWS}
+    data_path = index.get('data_path', '')
+    for key, rec in index['files'].items():
+        rows = rec.get('window')
+        if not rows:
+            continue
+        project = os.path.relpath(key, data_path).split(os.sep)[0]
+        ts = rows['ts']
+        cuts = [bisect_left(ts, now - seconds) for _, seconds in windows] + [len(ts)]
+        for k, (lo, hi) in enumerate(zip(cuts, cuts[1:])):
+            if lo == hi:
+                continue
+            for model, part in sum_window_rows(rows, lo, hi).items():
+                for name, _ in windows[:k + 1]:
+                    agg = result[name]
+                    for totals in (agg['total'], agg['model'].setdefault(model, new_usage_totals()),
+                                   agg['project'].setdefault(project, new_usage_totals())):
+                        for field, value in part.items():
+                            totals[field] += value
+    return result
+
+
+def new_window_columns() -> Dict[str, Any]:
+    """Empty per-file window rows: the WINDOW_COLUMNS arrays plus 'models',
+    the model names that the 'model' column indexes."""
+    return dict({column: array(code) for column, code in WINDOW_COLUMNS}, models=[])
+
+
+def append_window_entries(rec: Dict[str, Any], entries: List[tuple]) -> None:
+    """Add parsed entries (see parse_usage_line) to a file's rows, one per minute and model."""
+    minutes = rec['ts']
+    model_ids = rec['model']
+    models = rec['models']
+    ids = {name: i for i, name in enumerate(models)}
+    for ts, cost, *tokens, model in entries:
+        minute = ts // WINDOW_BUCKET_SECONDS * WINDOW_BUCKET_SECONDS
+        model_id = ids.get(model)
+        if model_id is None:
+            model_id = ids[model] = len(models)
+            models.append(model)
+        lo = bisect_left(minutes, minute)
+        hi = bisect_right(minutes, minute, lo)
+        i = next((j for j in range(lo, hi) if model_ids[j] == model_id), None)
+        if i is None:
+            # Only out-of-order lines land before the last row.
+            i = hi
+            for column, _ in WINDOW_COLUMNS:
+                rec[column].insert(i, 0)
+            minutes[i] = minute
+            model_ids[i] = model_id
+        rec['cost'][i] += cost
+        for name, value in zip(TOKEN_TYPES, tokens):
+            rec[name][i] += value
+        rec['messages'][i] += 1
+
+
+def prune_window_index(index: Dict[str, Any], cutoff: float) -> bool:
+    """Drop window rows of minutes that start before cutoff. Returns True if anything was dropped."""
+    changed = False
+    for rec in index.get('files', {}).values():
+        rows = rec.get('window')
+        i = bisect_left(rows['ts'], cutoff) if rows else 0
+        if i:
+            for column, _ in WINDOW_COLUMNS:
+                del rows[column][:i]
+            changed = True
+    return changed
+
+
+def window_totals(index: Dict[str, Any], now: float) -> Dict[str, Dict[str, float]]:
+    """Messages, tokens and cost over each of USAGE_WINDOWS, to the minute."""
+    result = {name: {'cost': 0.0, 'tokens': 0, 'messages': 0} for name, _ in USAGE_WINDOWS}
+    for rec in index['files'].values():
+        rows = rec.get('window')
+        if not rows:
+            continue
+        for name, seconds in USAGE_WINDOWS:
+            first = bisect_left(rows['ts'], now - seconds)
+            if first < len(rows['ts']):
+                totals = result[name]
+                totals['cost'] += sum(rows['cost'][first:])
+                totals['tokens'] += sum(sum(rows[column][first:]) for column in ('input', 'output', 'cache_creation'))
+                totals['messages'] += sum(rows['messages'][first:])
+    return result
+
+
+def encode_columns(rec: Dict[str, Any], columns) -> Dict[str, Any]:
+    """Copy of a file record with its array columns as base64 strings."""
+    return dict(rec, **{column: binascii.b2a_base64(rec[column].tobytes(), newline=False).decode('ascii')
+                        for column, _ in columns})
+
+
+def decode_columns(rec: Dict[str, Any], columns) -> None:
+    """Inverse of encode_columns(), in place."""
+    for column, code in columns:
+        values = array(code)
+        values.frombytes(binascii.a2b_base64(rec[column]))
+        rec[column] = values
+
+
+def encode_usage_index(index: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of the usage index with entry and window columns as base64 strings, for JSON."""
+    files = {}
+    for key, rec in index['files'].items():
+        files[key] = encode_columns(rec, ENTRY_COLUMNS)
+        if 'window' in rec:
+            files[key]['window'] = encode_columns(rec['window'], WINDOW_COLUMNS)
+    return dict(index, files=files)
+
+
+def decode_usage_index(index: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Inverse of encode_usage_index(); None if there is no usable index."""
+    if not index:
+        return None
+    try:
+        for rec in index['files'].values():
+            decode_columns(rec, ENTRY_COLUMNS)
+            if 'window' in rec:
+                decode_columns(rec['window'], WINDOW_COLUMNS)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return index
+
+
+def new_sketch() -> Dict[str, Any]:
+    """Empty quantile sketch.
+
+    Bucket i holds the weight of values in (γ^(i-1), γ^i], with γ set by
+    SKETCH_ACCURACY; counts[0] is bucket 'offset'. Values ≤ 0 go to 'zero'.
+    Two sketches merge by adding their buckets.
+    """
+    return {'offset': 0, 'counts': [], 'zero': 0.0}
+
+
+def sketch_add(sketch: Dict[str, Any], value: float, weight: float = 1.0) -> None:
+    """Add value with the given weight to a quantile sketch."""
+    if value <= 0:
+        sketch['zero'] += weight
+        return
+    i = math.ceil(math.log(value, SKETCH_GAMMA))
+    counts = sketch['counts']
+    if not counts:
+        sketch['offset'] = i
+    if i < sketch['offset']:
+        counts[:0] = [0.0] * (sketch['offset'] - i)
+        sketch['offset'] = i
+    elif i >= sketch['offset'] + len(counts):
+        counts.extend([0.0] * (i - sketch['offset'] - len(counts) + 1))
+    counts[i - sketch['offset']] += weight
+    if len(counts) > SKETCH_MAX_BINS:
+        # Fold the lowest buckets together; limits only read high percentiles.
+        extra = len(counts) - SKETCH_MAX_BINS
+        counts[extra] += sum(counts[:extra])
+        del counts[:extra]
+        sketch['offset'] += extra
+
+
+def sketch_quantile(sketch: Dict[str, Any], q: float) -> Optional[float]:
+    """Estimate the q-quantile (0..1) of a sketch, or None if it is empty."""
+    counts = sketch['counts']
+    rank = q * (sketch['zero'] + sum(counts))
+    seen = sketch['zero']
+    if seen > rank:
+        return 0.0
+    for i, count in enumerate(counts):
+        seen += count
+        if seen > rank:
+            break
+    else:
+        if not counts:
+            return None
+    return 2 * SKETCH_GAMMA ** (sketch['offset'] + i) / (SKETCH_GAMMA + 1)
+
+
+def close_session(store: Dict[str, Any], start: float, tokens: int, cost: float, half_life: float) -> None:
+    """Fold a closed session into the limit sketches of the session store.
+
+    Sessions already there are decayed by half every half_life seconds (0: never).
+    """
+    last = store.get('last_closed')
+    if half_life > 0 and last is not None and start > last:
+        # Percentiles ignore a common scale, so decaying what is already in
+        # the sketches when a session is added weighs every session by age.
+        factor = 0.5 ** ((start - last) / half_life)
+        for name in ('token_sketch', 'cost_sketch'):
+            sketch = store[name]
+            sketch['zero'] *= factor
+            sketch['counts'] = [count * factor for count in sketch['counts']]
+    store['last_closed'] = start
+    store['closed'] += 1
+    sketch_add(store['token_sketch'], tokens)
+    sketch_add(store['cost_sketch'], cost)
+
+
+def update_sessions(store: Dict[str, Any], entries, half_life: float = LIMIT_HALF_LIFE_DAYS * 86400) -> bool:
+    """Fold new usage entries into the persistent session store.
+
+    The store keeps closed sessions only as their count and quantile
+    sketches of their tokens and cost (see close_session()), plus the start
+    of the open session. Closed sessions are final. entries must yield every
+    indexed entry at or after the open session start, in time order; the
+    open session totals are recomputed from them in a single pass, and it is
+    closed once an entry arrives ≥5h after its start.
+
+    Sets store['open'] to [start, tokens, cost] of the open session (or None)
+    and returns True if the persistent part of the store changed.
+    """
+    store.setdefault('closed', 0)
+    store.setdefault('token_sketch', new_sketch())
+    store.setdefault('cost_sketch', new_sketch())
+    open_start = store.get('open_start')
+    cur_start = open_start
+    cur_tokens = 0
+    cur_cost = 0.0
+    for ts, tokens, cost in entries:
+        if cur_start is None or ts - cur_start >= SESSION_SECONDS:
+            if cur_start is not None:
+                close_session(store, cur_start, cur_tokens, cur_cost, half_life)
+            cur_start = ts
+            cur_tokens = 0
+            cur_cost = 0.0
+        cur_tokens += tokens
+        cur_cost += cost
+    store['open_start'] = cur_start
+    store['open'] = [cur_start, cur_tokens, cur_cost] if cur_start is not None else None
+    return cur_start != open_start
+
+
+# Usage index of this process and the window totals of its last update;
+# kept across renders by the daemon.
+_usage_index: Optional[Dict[str, Any]] = None
+_usage_windows: Optional[Dict[str, Dict[str, float]]] = None
+
+
+def analyze_usage_data(windows: bool = False, env: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
+    """Analyze Claude usage data from .jsonl files.
+
+    A "session" starts at the first message and lasts 5 hours from that
+    timestamp. The next message ≥5h after the session start begins a new
+    session. Closed sessions are kept in a persistent store next to the
+    usage index, so each call only regroups the entries of the open session
+    and the cost stays flat no matter how much history has accumulated.
+
+    With windows, the index starts keeping per-minute rows of the longest of
+    USAGE_WINDOWS as well, and keeps them from then on; their totals are left
+    in _usage_windows for get_usage_windows(). env holds the settings of the
+    render (default os.environ).
+    """
+    global _usage_index, _usage_windows
+    try:
+        data_path = get_claude_data_path()
+        if not data_path:
+            return None
+
+        now_utc = datetime.now(timezone.utc)
+        history_cutoff = now_utc - timedelta(days=HISTORY_DAYS)
+
+        # One process at a time scans transcripts; the others wait for its
+        # index, or use the saved one if the scan takes too long.
+        with CacheLock('usage', LOCK_TIMEOUT) as lock:
+            index = None if lock.contended else _usage_index
+            index = index or decode_usage_index(load_cache(USAGE_INDEX_FILE))
+            if not index or index.get('data_path') != str(data_path):
+                index = {'data_path': str(data_path), 'files': {}, 'sessions': {}}
+            if windows and lock.acquired and not index.get('windows'):
+                # The window rows need the whole longest window: parse afresh.
+                index.update(files={}, windows=True)
+            store = index['sessions']
+
+            # Entries before the open session belong to closed sessions, which
+            # are final; on a fresh index seed the store from the last HISTORY_DAYS.
+            open_start = store.get('open_start')
+            cutoff = open_start if open_start is not None else history_cutoff.timestamp()
+            now = now_utc.timestamp()
+            window_cutoff = now - max(seconds for _, seconds in USAGE_WINDOWS) if index.get('windows') else None
+            changed = lock.acquired and update_usage_index(index, data_path, cutoff, window_cutoff)
+
+            half_life = get_env_int('CLAUDE_STATUSLINE_HALF_LIFE_DAYS', LIMIT_HALF_LIFE_DAYS, env) * 86400
+            if update_sessions(store, iter_entries_since(index, open_start), half_life):
+                prune_usage_index(index, store['open_start'])
+                changed = True
+            active = store.pop('open')
+            if changed and lock.acquired:
+                save_cache(USAGE_INDEX_FILE, encode_usage_index(index))
+            _usage_index = index
+            _usage_windows = window_totals(index, now) if index.get('windows') else None
+
+        # The open session is active only while still within its 5h window.
+        if not active or now_utc.timestamp() - active[0] >= SESSION_SECONDS:
+            return None
+
+        session_start = datetime.fromtimestamp(active[0], timezone.utc)
+        total_tokens = active[1]
+        total_cost = active[2]
+
+        # Closed sessions feed the adaptive (by default P90) limits.
+        if store['closed'] >= 5:
+            q = min(max(get_env_int('CLAUDE_STATUSLINE_LIMIT_PERCENTILE', LIMIT_PERCENTILE, env), 1), 100) / 100
+            token_limit = max(sketch_quantile(store['token_sketch'], q), 19000)
+            cost_limit = max(sketch_quantile(store['cost_sketch'], q) * 1.2, 18.0)
+        else:
+            # Cold start: fewer than 5 historical sessions to learn from.
+            # A session sums input+output+cache_creation across a 5h window;
+            # with prompt caching that routinely reaches 1M+ tokens, so the old
+            # fixed limits (19k/88k/220k) pegged the bar permanently red. Use
+            # realistic budgets; once ≥5 sessions of history exist the
+            # adaptive limit above takes over automatically.
+            if total_tokens > 1_000_000:
+                token_limit, cost_limit = 3_000_000, 200.0
+            elif total_tokens > 250_000:
+                token_limit, cost_limit = 1_500_000, 100.0
+            else:
+                token_limit, cost_limit = 500_000, 40.0
+
+        return {
+            'total_tokens': total_tokens,
+            'token_limit': int(token_limit),
+            'cost_usd': total_cost,
+            'cost_limit': cost_limit,
+            'session_start': session_start,
+        }
+
+    except Exception:
+        return None
+
+
+def get_usage_windows(usage_job) -> Optional[Dict[str, Dict[str, float]]]:
+    """Totals over each of USAGE_WINDOWS (see window_totals), from the scan of usage_job."""
+    usage_job.done.wait()
+    return _usage_windows
+
+
+def calculate_reset_time(session_start: Optional[datetime] = None) -> str:
+    """Calculate time until session reset (5-hour rolling window)."""
+    try:
+        if session_start:
+            session_end = session_start + timedelta(hours=5)
+            now = datetime.now(timezone.utc)
+
+            if session_end > now:
+                diff = session_end - now
+                total_minutes = int(diff.total_seconds() / 60)
+                hours = total_minutes // 60
+                mins = total_minutes % 60
+                return f"{hours}h{mins:02d}m"
+
+        # Fallback: estimate next reset
+        now = datetime.now()
+        today_2pm = now.replace(hour=14, minute=0, second=0, microsecond=0)
+        next_reset = today_2pm if now < today_2pm else today_2pm + timedelta(days=1)
+        diff = next_reset - now
+
+        total_minutes = int(diff.total_seconds() / 60)
+        hours = total_minutes // 60
+        mins = total_minutes % 60
+
+        return f"{hours}h{mins:02d}m"
+    except Exception:
+        return "N/A"
+
+
+def format_number(num: float) -> str:
+    """Format number for display (e.g., 48000 -> 48.0k)."""
+    if num >= 1000000:
+        return f"{num/1000000:.1f}M"
+    elif num >= 1000:
+        return f"{num/1000:.1f}k"
+    else:
+        return f"{num:.0f}"
+
+
+def get_effort_level(env: Dict[str, str]) -> Optional[str]:
+    """Effort level (env var overrides settings file)."""
+    effort = env.get("CLAUDE_CODE_EFFORT_LEVEL")
+    if not effort:
+        paths = settings_paths()
+        effort = cached_config('effort', paths, lambda: read_effort_setting(paths))
+    return effort
+
+
+def settings_paths() -> List[Path]:
+    """Claude settings files, in order of precedence."""
+    return [
+        Path.home() / '.claude' / 'settings.json',
+        Path.home() / '.config' / 'claude' / 'settings.json',
+    ]
+
+
+def read_effort_setting(settings_paths: List[Path]) -> Optional[str]:
+    """effortLevel from the first settings file that sets it."""
+    for settings_path in settings_paths:
+        try:
+            with open(settings_path) as f:
+                effort = json.load(f).get('effortLevel')
+            if effort:
+                return effort
+        except Exception:
+            pass
+    return None
+
+
+# Last value of every collector as [used_at, value], keyed "name:cwd" (or
+# "name:" if it does not depend on cwd), served when a collector misses the
+# render deadline. The daemon keeps it in memory; one-shot runs load and save
+# LAST_VALUES_FILE.
+_last_values: Optional[Dict[str, Any]] = None
+_last_values_lock = threading.Lock()
+
+# Collector jobs still running, keyed like _last_values. A slow collector is
+# never started twice; later renders wait on the job already in flight.
+_inflight: Dict[str, 'CollectorJob'] = {}
+
+# True in the daemon, in refresh processes and for --report. They are off the
+# render path, so collectors that miss the deadline keep running, slow lookups
+# (gh) run synchronously instead of being deferred to a refresh process, and
+# cold starts may use a process pool (index_transcripts).
+_background = False
+
+
+def get_last_values() -> Dict[str, Any]:
+    """Last collector values of this process, loaded from disk on first use."""
+    global _last_values
+    with _last_values_lock:
+        if _last_values is None:
+            _last_values = (load_cache(LAST_VALUES_FILE) or {}).get('entries', {})
+        return _last_values
+
+
+def evict_last_values(values: Dict[str, list], now: float) -> None:
+    """Drop last values older than LAST_VALUES_MAX_AGE or beyond LAST_VALUES_MAX_ENTRIES."""
+    recent = sorted(((used_at, key) for key, (used_at, _) in values.items() if 0 <= now - used_at < LAST_VALUES_MAX_AGE),
+                    reverse=True)
+    keep = {key for _, key in recent[:LAST_VALUES_MAX_ENTRIES]}
+    for key in [key for key in values if key not in keep]:
+        del values[key]
+
+
+def remember(key: str, value) -> None:
+    """Record a collector result as the last known value for key."""
+    if key.startswith('usage:') and value:
+        # datetime is not JSON serializable; keep the cache on-disk friendly.
+        value = dict(value, session_start=value['session_start'].timestamp())
+    values = get_last_values()
+    now = time.time()
+    with _last_values_lock:
+        values[key] = [now, value]
+        if len(values) > LAST_VALUES_MAX_ENTRIES:
+            evict_last_values(values, now)
+
+
+def recall(key: str):
+    """Last known value for key, or None."""
+    entry = get_last_values().get(key)
+    value = entry[1] if entry else None
+    if key.startswith('usage:') and value:
+        value = dict(value, session_start=datetime.fromtimestamp(value['session_start'], timezone.utc))
+    return value
+
+
+def save_last_values() -> None:
+    """Merge this process's last values into LAST_VALUES_FILE, newest first, and evict old ones."""
+    values = get_last_values()
+    with CacheLock('last-values', LOCK_POLL_INTERVAL * 10) as lock:
+        if not lock.acquired:
+            return  # another process is saving; do not hold up the render
+        stored = (load_cache(LAST_VALUES_FILE) or {}).get('entries', {})
+        with _last_values_lock:
+            if all(key in stored and stored[key][1] == value and used_at - stored[key][0] < LAST_VALUES_TOUCH
+                   for key, (used_at, value) in values.items()):
+                return
+            for key, entry in values.items():
+                if key not in stored or stored[key][0] <= entry[0]:
+                    stored[key] = entry
+        evict_last_values(stored, time.time())
+        save_cache(LAST_VALUES_FILE, {'entries': stored})
+
+
+class CollectorJob:
+    """One collector call running in a background thread."""
+
+    def __init__(self, key: str, fn, args: tuple):
+        self.key = key
+        self.value = None
+        self.done = threading.Event()
+        threading.Thread(target=self._run, args=(fn, args), daemon=True).start()
+
+    def _run(self, fn, args):
+        try:
+            with trace_span(fn.__name__, 'collector', key=self.key):
+                self.value = fn(*args)
+        except Exception:
+            self.value = None
+        remember(self.key, self.value)
+        with _last_values_lock:
+            _inflight.pop(self.key, None)
+        self.done.set()
+
+
+def start_collector(key: str, fn, *args) -> CollectorJob:
+    """Run fn(*args) in the background unless a job for key is already running."""
+    with _last_values_lock:
+        job = _inflight.get(key)
+        if job is None:
+            job = _inflight[key] = CollectorJob(key, fn, args)
+        return job
+
+
+def collect_components(cwd: str, env: Dict[str, str], deadline: Optional[float]) -> tuple:
+    """Run all data collectors concurrently and wait at most deadline seconds.
+
+    Returns (values, missed): values maps collector name to its result, and
+    for every collector in missed, which did not finish in time, to its last
+    known value (None if there is none).
+    """
+    # name -> (key, function, *args); usage data is the same for every cwd.
+    windows = bool(env.get('CLAUDE_STATUSLINE_WINDOWS'))
+    collectors = {
+        'git': (f"git:{cwd}", collect_git_status, cwd, env),
+        'usage': ("usage:", analyze_usage_data, windows, env),
+        'effort': ("effort:", get_effort_level, env),
+    }
+    jobs = {name: start_collector(*call) for name, call in collectors.items()}
+    # Window totals come from the same transcript scan as the session.
+    if windows:
+        jobs['windows'] = start_collector("windows:", get_usage_windows, jobs['usage'])
+    # The PR cache is keyed by branch and HEAD, so that lookup waits for git.
+    jobs['pr'] = start_collector(f"pr:{cwd}", get_pr_data, cwd, jobs['git'])
+
+    end = None if deadline is None else time.monotonic() + deadline
+    values = {}
+    missed = []
+    for name, job in jobs.items():
+        if job.done.wait(None if end is None else max(0.0, end - time.monotonic())):
+            values[name] = job.value
+        else:
+            values[name] = recall(job.key)
+            missed.append(name)
+    return values, missed
+
+
+def spawn_refresh(cwd: str, only: Optional[str] = None) -> None:
+    """Finish collecting for cwd in a detached process, to update the last values.
+
+    only='pr' refreshes just the PR lookup (see refresh). A marker file keeps
+    concurrent renders from spawning more than one refresh of each kind per
+    directory at a time.
+    """
+    import hashlib
+    import subprocess
+    suffix = f"-{only}" if only else ""
+    marker = get_cache_dir() / f"refresh-{hashlib.sha1(cwd.encode('utf-8')).hexdigest()[:16]}{suffix}.lock"
+    try:
+        if time.time() - marker.stat().st_mtime < REFRESH_TIMEOUT:
+            return
+    except OSError:
+        pass
+    try:
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        marker.touch()
+        subprocess.Popen(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'statusline.py'),
+             '--refresh', cwd, str(marker),
+             *(['--only', only] if only else [])],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except OSError:
+        pass
+
+
+def refresh(cwd: str, marker: Optional[str] = None, only: Optional[str] = None) -> None:
+    """Run every collector for cwd to completion and save the last values.
+
+    With only='pr', run just the PR lookup and the git status it is keyed by.
+    """
+    global _background
+    _background = True
+    try:
+        with trace_span('refresh', 'render', cwd=cwd, only=only):
+            if only == 'pr':
+                git_job = start_collector(f"git:{cwd}", collect_git_status, cwd)
+                start_collector(f"pr:{cwd}", get_pr_data, cwd, git_job).done.wait()
+            else:
+                collect_components(cwd, os.environ, None)
+            save_last_values()
+    finally:
+        flush_trace('statusline refresh')
+        if marker:
+            try:
+                os.unlink(marker)
+            except OSError:
+                pass
+
+
+def get_deadline(env: Dict[str, str]) -> float:
+    """Overall collection deadline in seconds (CLAUDE_STATUSLINE_DEADLINE_MS)."""
+    try:
+        return float(env.get('CLAUDE_STATUSLINE_DEADLINE_MS') or DEFAULT_DEADLINE_MS) / 1000
+    except ValueError:
+        return DEFAULT_DEADLINE_MS / 1000
+
+
+def build_statusline(data: Dict[str, Any], term_width: int, env: Optional[Dict[str, str]] = None) -> str:
+    """Render the statusline for one Claude Code JSON payload."""
+    if env is None:
+        env = os.environ
+
+    # Extract information from JSON
+    cwd = data.get('workspace', {}).get('current_dir', str(Path.cwd()))
+    model_name = data.get('model', {}).get('display_name', 'Unknown')
+    # Shorten verbose context suffix like "(1M context)" to "[1M]"
+    model_name = re.sub(r'\s*\(([0-9]+[kKmM])\s+context\)', r' [\1]', model_name)
+    context_used = data.get('context_window', {}).get('used_percentage', 0)
+
+    # Run git, PR, usage and settings lookups concurrently under one deadline;
+    # late components render from their last known value.
+    values, missed = collect_components(cwd, env, get_deadline(env))
+    if not _background:
+        save_last_values()
+        if missed:
+            spawn_refresh(cwd)
+
+    # Gather every component once; truncation below is pure arithmetic.
+    segments = []
+
+    # Directory name (git root basename, or cwd basename as fallback)
+    git = values['git']
+    dir_name = Path(git['toplevel']).name if git else Path(cwd).name
+    segments.append(Segment(dir_name))
+
+    # Git information
+    if git:
+        segments.append(git_segment(git))
+
+    # PR information
+    pr_seg = pr_segment(values['pr'])
+    if pr_seg:
+        segments.append(pr_seg)
+
+    # Context usage with progress bar
+    ctx_bar = progress_bar(context_used, width=8)
+    segments.append(Segment(f"🧠 {ctx_bar}"))
+
+    # Usage data from Claude files
+    usage_data = values['usage']
+
+    if usage_data:
+        # Token usage with progress bar
+        token_pct = (usage_data['total_tokens'] / usage_data['token_limit']) * 100 if usage_data['token_limit'] > 0 else 0
+        token_bar = progress_bar(token_pct, width=8)
+        tokens_text = f"🔋{format_number(usage_data['total_tokens'])}/{format_number(usage_data['token_limit'])} {token_bar}"
+
+        # # Cost with progress bar
+        # cost_pct = (usage_data['cost_usd'] / usage_data['cost_limit']) * 100 if usage_data['cost_limit'] > 0 else 0
+        # cost_bar = progress_bar(cost_pct, width=8)
+        # cost_text = f"💰${usage_data['cost_usd']:.2f}/${usage_data['cost_limit']:.2f} {cost_bar}"
+
+        # Reset countdown timer
+        reset_time = calculate_reset_time(usage_data.get('session_start'))
+        time_text = f"⏱️ {reset_time}"
+
+        segments.extend([Segment(tokens_text), Segment(time_text)])
+
+    # Optional rolling-window totals, e.g. "📅 24h 1.9M · 7d 7.1M", also
+    # between sessions
+    windows = values.get('windows') or {}
+    shown = [name.strip() for name in env.get('CLAUDE_STATUSLINE_WINDOWS', '').split(',')]
+    window_texts = [f"{name} {format_number(windows[name]['tokens'])}" for name in shown if name in windows]
+    if window_texts:
+        segments.append(Segment(f"📅 {' · '.join(window_texts)}"))
+
+    effort_icons = {
+        'low': '▁',
+        'medium': '▃',
+        'high': '▅',
+        'xhigh': '▇',
+    }
+    effort_name = values['effort'] or 'medium'
+    effort_icon = effort_icons.get(effort_name, '❔')
+    effort_text = f"{effort_icon} {effort_name}"
+
+    # Model name and effort at the end
+    segments.append(Segment(f"🤖 {model_name} {effort_text}"))
+
+    return layout_statusline(segments, term_width)
+
+
+def daemon_running(socket_path: str) -> bool:
+    """True if something accepts connections on socket_path."""
+    import socket
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(DAEMON_TIMEOUT)
+            sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+
+def handle_daemon_request(request: bytes) -> str:
+    """Render the statusline for one daemon request (see statusline.encode_daemon_request)."""
+    try:
+        header, _, raw = request.partition(b'\0\0')
+        columns, cwd, *env_fields = (os.fsdecode(field) for field in header.split(b'\0'))
+        env = dict(field.split('=', 1) for field in env_fields)
+        data = json.loads(raw)
+        if not data.get('workspace', {}).get('current_dir') and cwd:
+            data['workspace'] = dict(data.get('workspace') or {}, current_dir=cwd)
+        with trace_span('handle_daemon_request', 'render'):
+            return build_statusline(data, int(columns or 120), env)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return "Error: Invalid JSON input"
+    except Exception as e:
+        return f"Error: {e}"
+    finally:
+        flush_trace('statusline daemon')
+
+
+def serve_daemon():
+    """Run the resident statusline daemon on the per-user Unix socket.
+
+    The daemon keeps the usage index, git results and PR lookups in memory
+    between renders, so a client only pays for the socket round-trip. Each
+    connection gets its own thread; concurrent renders share collector jobs
+    (see start_collector).
+    """
+    import signal
+    import socketserver
+
+    class StatuslineHandler(socketserver.StreamRequestHandler):
+        """One statusline per connection: a request in (until EOF), the statusline out."""
+
+        def handle(self):
+            request = self.rfile.read()
+            if not request:
+                return  # liveness probe from daemon_running()
+            line = handle_daemon_request(request)
+            try:
+                self.wfile.write(line.encode('utf-8'))
+            except OSError:
+                pass  # client gave up waiting
+
+    class StatuslineServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+        request_queue_size = DAEMON_BACKLOG
+
+    socket_path = get_socket_path()
+    if socket_owned(socket_path) and daemon_running(socket_path):
+        print(f"statusline daemon already running on {socket_path}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        os.unlink(socket_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        # e.g. another user's file in the shared temp directory
+        print(f"cannot replace {socket_path}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    old_umask = os.umask(0o077)
+    try:
+        server = StatuslineServer(socket_path, StatuslineHandler)
+    finally:
+        os.umask(old_umask)
+    global _background
+    _background = True
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            os.unlink(socket_path)
+        except OSError:
+            pass
+
+
+class Inotify:
+    """Minimal inotify(7) binding through ctypes (Linux only).
+
+    Raises OSError if inotify is unavailable.
+    """
+
+    MODIFY = 0x2
+    ATTRIB = 0x4
+    MOVED_FROM = 0x40
+    MOVED_TO = 0x80
+    CREATE = 0x100
+    DELETE = 0x200
+    IGNORED = 0x8000
+    ISDIR = 0x40000000
+    CHANGES = MODIFY | ATTRIB | MOVED_FROM | MOVED_TO | CREATE | DELETE
+
+    def __init__(self):
+        import ctypes
+        try:
+            self.libc = ctypes.CDLL(None, use_errno=True)
+            self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError) as e:
+            raise OSError(f"inotify unavailable: {e}")
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches: Dict[int, str] = {}
+        self.paths: Dict[str, int] = {}
+
+    def add(self, path) -> None:
+        """Watch directory path for changes of its entries (no-op if already watched or missing)."""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.CHANGES)
+        if wd >= 0:
+            self.watches[wd] = str(path)
+            self.paths[str(path)] = wd
+
+    def remove(self, path) -> None:
+        """Stop watching directory path (no-op if it is not watched)."""
+        wd = self.paths.pop(str(path), None)
+        if wd is not None:
+            del self.watches[wd]
+            self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self) -> List[tuple]:
+        """Pending events as (directory, name, mask); empty if there are none."""
+        import struct
+        try:
+            buf = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        events = []
+        pos = 0
+        while pos + 16 <= len(buf):
+            wd, mask, _cookie, length = struct.unpack_from('iIII', buf, pos)
+            name = os.fsdecode(buf[pos + 16:pos + 16 + length].rstrip(b'\0'))
+            pos += 16 + length
+            if mask & self.IGNORED:
+                # The directory is gone (or remove() ran): the kernel dropped the watch.
+                path = self.watches.pop(wd, None)
+                if path is not None and self.paths.get(path) == wd:
+                    del self.paths[path]
+            elif wd in self.watches:
+                events.append((self.watches[wd], name, mask))
+        return events
+
+
+def watch_targets(cwd: str) -> Dict[str, Optional[set]]:
+    """Directories whose changes affect the statusline for cwd.
+
+    Maps each directory to the entry names that matter there, or None for
+    any entry: the git dir (HEAD, index, refs, config), the directory of the
+    current branch ref and the settings directories. The transcript tree is
+    watched separately (see watch_tree).
+    """
+    targets: Dict[str, Optional[set]] = {}
+    toplevel = find_git_toplevel(cwd)
+    git_dir = find_git_dir(toplevel) if toplevel else None
+    if git_dir:
+        common_dir = find_git_common_dir(git_dir)
+        shared = {'packed-refs', 'config'}
+        targets[str(common_dir)] = shared
+        targets[str(git_dir)] = {'HEAD', 'index'} | (shared if common_dir == git_dir else set())
+        try:
+            head = (git_dir / 'HEAD').read_text(encoding='utf-8').strip()
+        except OSError:
+            head = ''
+        if head.startswith('ref: '):
+            targets[str((common_dir / head[len('ref: '):]).parent)] = None
+    for path in settings_paths():
+        targets[str(path.parent)] = {path.name}
+    return targets
+
+
+def watch_tree(inotify: Inotify, tree: set, root: str) -> None:
+    """Watch root and every directory below it (nested session and subagent
+    directories of the transcript tree), adding those watched to tree."""
+    directories = [root]
+    for directory in directories:  # grows while walking
+        if directory not in inotify.paths:
+            inotify.add(directory)
+        if directory in inotify.paths:
+            tree.add(directory)
+        try:
+            with os.scandir(directory) as it:
+                directories.extend(entry.path for entry in it if entry.is_dir(follow_symlinks=False))
+        except OSError:
+            pass
+
+
+def wait_for_change(inotify: Inotify, targets: Dict[str, Optional[set]], tree: set) -> None:
+    """Block until a relevant file event (then until events settle) or the next full minute.
+
+    Any change in a directory of the transcript tree counts; directories
+    created there are watched right away (see watch_tree).
+    """
+    import select
+    changed = False
+    while True:
+        timeout = WATCH_DEBOUNCE if changed else 60 - time.time() % 60
+        if not select.select([inotify.fd], [], [], timeout)[0]:
+            return  # settled after a change, or the minute tick
+        for directory, name, mask in inotify.read():
+            if directory in tree:
+                if mask & Inotify.ISDIR and mask & (Inotify.CREATE | Inotify.MOVED_TO):
+                    watch_tree(inotify, tree, os.path.join(directory, name))
+                names = None
+            else:
+                names = targets.get(directory, ())
+            if (names is None or name in names) and not name.endswith('.lock'):
+                changed = True
+
+
+def wait_for_change_polling(cwd: str, data: Dict[str, Any]) -> None:
+    """wait_for_change() without inotify: compare output_fingerprint() periodically."""
+    fingerprint = output_fingerprint(cwd, data)
+    minute = int(time.time() // 60)
+    while True:
+        time.sleep(min(WATCH_POLL_INTERVAL, 60 - time.time() % 60))
+        if int(time.time() // 60) != minute or output_fingerprint(cwd, data) != fingerprint:
+            return
+
+
+def emit_line(line: str, output: Optional[str]) -> None:
+    """Write a statusline to stdout, a FIFO (skipped while nobody reads) or a file (atomically)."""
+    if not output:
+        print(line, flush=True)
+        return
+    import stat
+    content = (line + '\n').encode('utf-8')
+    try:
+        is_fifo = stat.S_ISFIFO(os.stat(output).st_mode)
+    except OSError:
+        is_fifo = False
+    if is_fifo:
+        try:
+            fd = os.open(output, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError:
+            return  # no reader
+        try:
+            os.write(fd, content)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+        return
+    tmp_path = f"{output}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, output)
+    except OSError:
+        pass
+
+
+def watch(cwd: str, output: Optional[str] = None, data: Optional[Dict[str, Any]] = None) -> None:
+    """Stay resident and emit a new statusline whenever one of its inputs changes.
+
+    Re-renders on inotify events for git, settings and transcripts (see
+    watch_targets) and at every full minute for the reset countdown; only
+    lines that differ from the previous one are emitted.
+    """
+    global _background
+    _background = True
+    data = dict(data or {})
+    data['workspace'] = dict(data.get('workspace') or {}, current_dir=cwd)
+    try:
+        inotify = Inotify()
+    except OSError:
+        inotify = None
+
+    last_line = None
+    tree: set = set()  # watched directories of the transcript tree
+    while True:
+        if inotify is not None:
+            # Re-resolved every time, as the branch may have changed. The
+            # transcript tree is walked once; wait_for_change() then follows
+            # new directories. Watching before rendering means a change after
+            # the render is never missed.
+            targets = watch_targets(cwd)
+            data_path = get_claude_data_path()
+            if not tree and data_path:
+                watch_tree(inotify, tree, str(data_path))
+            tree.intersection_update(inotify.paths)  # deleted directories
+            for directory in set(inotify.paths) - set(targets) - tree:
+                inotify.remove(directory)
+            for directory in targets:
+                if directory not in inotify.paths:
+                    inotify.add(directory)
+
+        line = build_statusline(data, get_term_width())
+        if _inflight:
+            # Collectors missed the deadline: show their results once they are in.
+            for job in list(_inflight.values()):
+                job.done.wait(REFRESH_TIMEOUT)
+            line = build_statusline(data, get_term_width())
+        if line != last_line:
+            emit_line(line, output)
+            last_line = line
+        flush_trace('statusline watch')
+
+        if inotify is None:
+            wait_for_change_polling(cwd, data)
+        else:
+            wait_for_change(inotify, targets, tree)
+
+
+def print_usage_report() -> None:
+    """Print usage per window, by token type, model and project (--report).
+
+    Reads the per-minute window rows of the saved usage index, which the
+    first report (or CLAUDE_STATUSLINE_WINDOWS) starts keeping up to date;
+    later reports only parse what was appended since.
+    """
+    global _background
+    _background = True
+    analyze_usage_data(windows=True)
+    index = _usage_index
+    if not index or not index.get('windows'):
+        print("No usage data found")
+        return
+    for name, agg in aggregate_usage(index, time.time()).items():
+        total = agg['total']
+        print(f"Last {name}: {format_number(total['tokens'])} tokens, ${total['cost']:.2f}, {total['messages']} messages")
+        print("  " + ", ".join(f"{token_type} {format_number(total[token_type])}" for token_type in TOKEN_TYPES))
+        for group in ('model', 'project'):
+            print(f"  by {group}:")
+            for key, totals in sorted(agg[group].items(), key=lambda item: -item[1]['cost']):
+                print(f"    {key or 'unknown':<40} {format_number(totals['tokens']):>8}  ${totals['cost']:.2f}")
+
+
+def output_fingerprint(cwd: str, data: Dict[str, Any]) -> List[Any]:
+    """Cheap fingerprints of every data source of a render, using stat only.
+
+    Covers git HEAD, refs, config and index, the session transcript, the
+    data directory (new projects) and the settings files. Other sessions'
+    transcripts are left to OUTPUT_CACHE_TTL: statting every project
+    directory on each render would cost more than the cache saves.
+    """
+    toplevel = find_git_toplevel(cwd)
+    git_dir = find_git_dir(toplevel) if toplevel else None
+    data_path = get_claude_data_path()
+    transcript = data.get('transcript_path')
+    return [
+        git_fingerprint(git_dir) if git_dir else None,
+        stat_key(transcript) if transcript else None,
+        stat_key(data_path) if data_path else None,
+        [stat_key(path) for path in settings_paths()],
+    ]
+
+
+def output_cache_key(data: Dict[str, Any], term_width: int) -> str:
+    """OUTPUT_CACHE_FILE key of a payload: the fields build_statusline() reads."""
+    return json.dumps([
+        data.get('workspace', {}).get('current_dir') or os.getcwd(),
+        data.get('model', {}).get('display_name'),
+        data.get('context_window', {}).get('used_percentage'),
+        term_width,
+        [os.environ.get(name) for name in DAEMON_ENV_VARS],
+    ])
+
+
+def cached_output(key: str, fingerprint: List[Any]) -> Optional[str]:
+    """The cached statusline for key, if still fresh and fingerprint matches."""
+    entry = (load_cache(OUTPUT_CACHE_FILE) or {}).get('lines', {}).get(key)
+    if entry and 0 <= time.time() - entry[0] < OUTPUT_CACHE_TTL and entry[1] == fingerprint:
+        return entry[2]
+    return None
+
+
+def store_output(key: str, fingerprint: List[Any], statusline: str) -> None:
+    """Remember a rendered statusline in OUTPUT_CACHE_FILE."""
+    now = time.time()
+    lines = (load_cache(OUTPUT_CACHE_FILE) or {}).get('lines', {})
+    lines = {k: entry for k, entry in lines.items() if 0 <= now - entry[0] < OUTPUT_CACHE_TTL}
+    lines[key] = [now, fingerprint, statusline]
+    save_cache(OUTPUT_CACHE_FILE, {'lines': lines})
+
+
+def record_payload(path: str, data: Dict[str, Any]) -> None:
+    """Append a payload to the JSONL file path (CLAUDE_STATUSLINE_RECORD), for loadtest.py."""
+    line = json.dumps({'time': time.time(), 'payload': data}) + '\n'
+    try:
+        fd = os.open(os.path.expanduser(path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, line.encode('utf-8'))
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def main(raw: Optional[bytes] = None, daemon: bool = True):
+    """Render the statusline for a payload (default: read from stdin) in this process.
+
+    daemon=False skips asking the daemon, which the caller already did.
+    """
+    record_span('interpreter start', 'startup', _PROCESS_START, _IMPORT_START)
+    record_span('import statusline', 'startup', _IMPORT_START, time.perf_counter())
+    if raw is None:
+        raw = sys.stdin.buffer.read()
+    term_width = get_term_width()
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        print("Error: Invalid JSON input")
+        return
+    if os.environ.get('CLAUDE_STATUSLINE_RECORD'):
+        record_payload(os.environ['CLAUDE_STATUSLINE_RECORD'], data)
+    # Keep room for the render time, which is only known at the end.
+    show_timing = env_flag('CLAUDE_STATUSLINE_SHOW_TIMING')
+    if show_timing:
+        term_width -= RENDER_TIME_WIDTH
+
+    # Identical payloads arrive in bursts; reuse the last line while nothing changed.
+    with trace_span('main', 'render'):
+        cwd = data.get('workspace', {}).get('current_dir') or os.getcwd()
+        key = output_cache_key(data, term_width)
+        fingerprint = output_fingerprint(cwd, data)
+        statusline = cached_output(key, fingerprint)
+        count('output_cache.miss' if statusline is None else 'output_cache.hit')
+        if statusline is None:
+            if daemon:
+                with trace_span('request_from_daemon', 'render'):
+                    statusline = request_from_daemon(raw, term_width)
+            complete = True
+            if statusline is None:
+                with trace_span('build_statusline', 'render'):
+                    statusline = build_statusline(data, term_width)
+                # Lines with components that missed the deadline are not kept.
+                complete = not _inflight
+            if complete:
+                store_output(key, fingerprint, statusline)
+
+    if show_timing:
+        statusline += f" | ⚡ {(time.perf_counter() - _PROCESS_START) * 1000:.0f}ms"
+    print(statusline)
+    flush_trace('statusline')
+
+
+def cli():
+    """Command line of statusline.py: --daemon, --report, --watch, --refresh or a render."""
+    if '--trace' in sys.argv[1:]:
+        sys.argv.remove('--trace')
+        start_trace()
+    if '--daemon' in sys.argv[1:]:
+        serve_daemon()
+    elif '--report' in sys.argv[1:]:
+        print_usage_report()
+    elif sys.argv[1:2] == ['--watch']:
+        args = sys.argv[2:]
+        output = None
+        if '--output' in args:
+            i = args.index('--output')
+            output = args[i + 1] if i + 1 < len(args) else None
+            del args[i:i + 2]
+        # An optional payload (model name etc.) can be piped in.
+        payload = {} if sys.stdin.isatty() else json.loads(sys.stdin.buffer.read() or b'{}')
+        try:
+            watch(os.path.abspath(args[0]) if args else os.getcwd(), output, payload)
+        except KeyboardInterrupt:
+            pass
+    elif sys.argv[1:2] == ['--refresh']:
+        args = sys.argv[2:]
+        only = None
+        if '--only' in args:
+            i = args.index('--only')
+            only = args[i + 1] if i + 1 < len(args) else None
+            del args[i:i + 2]
+        refresh(*args[:2], only=only)
+    else:
+        main()
+
+
+if __name__ == "__main__":
+    cli()
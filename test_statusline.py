@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Tests for the parsers of statusline_core.py that replaced git invocations
+and full transcript reads, checked against git itself and against the
+straightforward reads they replace.
+
+Usage:
+    python3 -m unittest test_statusline
+"""
+
+import io
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+import statusline_core as core
+
+
+def git(cwd, *args):
+    """Output of a git command in cwd, with a fixed identity and no user config."""
+    env = dict(os.environ, GIT_CONFIG_GLOBAL=os.devnull, GIT_CONFIG_NOSYSTEM='1',
+               GIT_AUTHOR_NAME='t', GIT_AUTHOR_EMAIL='t@example.com',
+               GIT_COMMITTER_NAME='t', GIT_COMMITTER_EMAIL='t@example.com')
+    return subprocess.run(['git', *args], cwd=cwd, env=env, check=True, capture_output=True, text=True).stdout
+
+
+class GitRepoTest(unittest.TestCase):
+    """A repository with every kind of change, including awkward file names."""
+
+    def setUp(self):
+        self.repo = Path(tempfile.mkdtemp(prefix='statusline-test-'))
+        self.addCleanup(shutil.rmtree, self.repo)
+        git(self.repo, 'init', '-q', '-b', 'main')
+        self.write('a.txt', 'one\ntwo\nthree\n')
+        self.write('with space.txt', 'x\n')
+        self.write('new\nline.txt', 'y\n')
+        self.write('old name.txt', ''.join(f'line {i}\n' for i in range(20)))
+        self.write('gone.txt', 'bye\n')
+        git(self.repo, 'add', '-A')
+        git(self.repo, 'commit', '-q', '-m', 'initial')
+
+        self.write('a.txt', 'one\n2\nthree\nfour\n')   # +2 -1, unstaged
+        self.write('with space.txt', 'x\nx\n')          # +1, staged
+        git(self.repo, 'add', 'with space.txt')
+        self.write('new\nline.txt', '')                 # -1
+        self.write('added.txt', 'a\nb\n')               # +2, new file
+        git(self.repo, 'add', 'added.txt')
+        git(self.repo, 'rm', '-q', 'gone.txt')          # -1
+        git(self.repo, 'mv', 'old name.txt', 'new name.txt')
+        self.write('new name.txt', ''.join(f'line {i}\n' for i in range(19)) + 'changed\n')
+
+    def write(self, name, text):
+        (self.repo / name).write_text(text)
+
+    def query(self, numstat=None):
+        git_dir = core.find_git_dir(self.repo)
+        return core.query_git_status(str(self.repo), self.repo, git_dir, True, numstat)
+
+    def test_porcelain_v2_records(self):
+        result, dirty, _ = self.query()
+        self.assertEqual(sorted(dirty), sorted(['a.txt', 'with space.txt', 'new\nline.txt', 'added.txt',
+                                                'gone.txt', 'new name.txt']))
+        # The rename was edited after `git mv`: an "RM" record, one modified file.
+        self.assertEqual((result['added'], result['modified'], result['deleted']), (1, 4, 1))
+        self.assertEqual((result['branch'], result['remote']), ('main', 'local'))
+        self.assertEqual(result['head'], git(self.repo, 'rev-parse', 'HEAD').strip())
+
+    def test_numstat_matches_git(self):
+        expected_added = expected_removed = 0
+        for line in git(self.repo, 'diff', '--numstat', 'HEAD').splitlines():
+            added, removed, _ = line.split('\t', 2)
+            expected_added += int(added)
+            expected_removed += int(removed)
+        result, _, numstat = self.query()
+        self.assertEqual((result['lines_added'], result['lines_removed']), (expected_added, expected_removed))
+        # The rename is one file with its own counts, not a delete and an add.
+        self.assertEqual(numstat['new name.txt'][1:], [1, 1])
+
+        # Reusing the counts: only the file edited since is diffed again.
+        self.write('a.txt', 'one\n')
+        result, _, _ = self.query(numstat)
+        self.assertEqual(result['lines_added'] - expected_added, -2)
+        self.assertEqual(result['lines_removed'] - expected_removed, 1)
+
+    def test_packed_refs(self):
+        git(self.repo, 'commit', '-q', '-m', 'second')
+        git(self.repo, 'branch', 'feature/x')
+        git(self.repo, 'tag', '-a', '-m', 'annotated', 'v1')
+        git(self.repo, 'pack-refs', '--all')
+        git_dir = core.find_git_dir(self.repo)
+        self.assertFalse((git_dir / 'refs' / 'heads' / 'main').exists())
+        for ref in ('refs/heads/main', 'refs/heads/feature/x', 'refs/tags/v1'):
+            self.assertEqual(core.resolve_git_ref(git_dir, git_dir, ref), git(self.repo, 'rev-parse', ref).strip())
+        self.assertIsNone(core.resolve_git_ref(git_dir, git_dir, 'refs/heads/missing'))
+        self.assertEqual(core.read_git_head(git_dir), ('main', git(self.repo, 'rev-parse', 'HEAD').strip()))
+
+
+class GitConfigTest(unittest.TestCase):
+    CONFIG = '''\
+[core]
+\tbare = false
+[remote "origin"]
+\turl = "https://example.com/a b.git" ; comment
+\tfetch = +refs/heads/*:refs/remotes/origin/*
+[Remote "up\\"stream"]
+\turl = git@example.com:x.git # comment
+[branch "feature/x"]
+\tremote = upstream
+\tmerge = refs/heads/feature/x
+[branch.legacy]
+\tremote = origin
+[branch "local"]
+\tremote = .
+[alias]
+\tflag
+'''
+
+    def setUp(self):
+        fd, path = tempfile.mkstemp(prefix='statusline-config-')
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.CONFIG)
+        self.path = Path(path)
+        self.addCleanup(os.unlink, path)
+
+    def test_matches_git(self):
+        config = core.read_git_config(self.path)
+        expected = {}
+        for line in git(self.path.parent, 'config', '--file', str(self.path), '--list').splitlines():
+            name, equals, value = line.partition('=')
+            value = value if equals else 'true'  # a key without value is a true boolean
+            section, _, key = name.rpartition('.')
+            section, _, sub = section.partition('.')
+            expected.setdefault((section, sub or None), {})[key] = value
+        self.assertEqual(config, expected)
+
+    def test_branch_remote(self):
+        config = core.read_git_config(self.path)
+        self.assertEqual(core.git_branch_remote(config, 'feature/x'), 'upstream')
+        self.assertEqual(core.git_branch_remote(config, 'legacy'), 'origin')
+        self.assertEqual(core.git_branch_remote(config, 'local'), 'origin')
+        self.assertEqual(core.git_branch_remote({}, 'main'), 'local')
+
+
+def transcript_line(rng, ts):
+    """A transcript line in Claude Code's layout; every third one has usage."""
+    if rng.random() < 0.3:
+        return json.dumps({'type': 'user', 'message': {'role': 'user', 'content': 'q' * rng.randint(0, 300)},
+                           'timestamp': core.datetime.fromtimestamp(ts, core.timezone.utc).isoformat()[:23] + 'Z'},
+                          separators=(',', ':'))
+    return json.dumps({
+        'type': 'assistant',
+        'message': {
+            'model': rng.choice(['claude-sonnet-4-5', 'claude-opus-4-1']),
+            'role': 'assistant',
+            'content': [{'type': 'text', 'text': '{"usage": ' * rng.randint(0, 3) + 'x' * rng.randint(0, 500)}],
+            'usage': {'input_tokens': rng.randint(1, 99), 'output_tokens': rng.randint(1, 99),
+                      'cache_creation_input_tokens': 0, 'cache_read_input_tokens': rng.randint(0, 999),
+                      'cache_creation': {'ephemeral_5m_input_tokens': 0}},
+        },
+        'timestamp': core.datetime.fromtimestamp(ts, core.timezone.utc).isoformat()[:23] + 'Z',
+    }, separators=(',', ':'))
+
+
+class TranscriptReaderTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(4)
+        self.data = ''.join(transcript_line(rng, 1.7e9 + i * 60) + '\n' for i in range(300)).encode('utf-8')
+
+    def test_reverse_blocks_match_forward_read(self):
+        forward = list(core.iter_usage_lines(self.data))
+        self.assertTrue(forward)
+        for block_size in (1, 7, 64, 1000, 65536):
+            backward = list(core.read_usage_lines_reversed(io.BytesIO(self.data), len(self.data), block_size))
+            self.assertEqual(backward[::-1], forward, block_size)
+
+    def test_reverse_entries_match_forward_entries(self):
+        cutoff = 1.7e9 + 100 * 60
+        forward, backward = [], []
+        self.assertEqual(core.read_entries_forward(io.BytesIO(self.data), 0, cutoff, forward), len(self.data))
+        self.assertEqual(core.read_entries_reversed(io.BytesIO(self.data), len(self.data), cutoff, backward),
+                         len(self.data))
+        self.assertEqual(backward, forward)
+        self.assertTrue(all(entry[0] >= cutoff for entry in forward))
+
+    def test_sliced_fields_match_full_decode(self):
+        for line in core.iter_usage_lines(self.data):
+            self.assertEqual(core.slice_usage_fields(line), core.decode_usage_fields(line))
+
+
+class SketchTest(unittest.TestCase):
+    def test_quantiles_within_accuracy(self):
+        rng = random.Random(0)
+        values = [rng.lognormvariate(12, 1.5) for _ in range(5000)]
+        sketch = core.new_sketch()
+        for value in values:
+            core.sketch_add(sketch, value)
+        values.sort()
+        for q in (0.5, 0.9, 0.95, 0.99):
+            exact = values[math.floor(q * len(values))]
+            self.assertLessEqual(abs(core.sketch_quantile(sketch, q) - exact) / exact, core.SKETCH_ACCURACY, q)
+
+    def test_folded_low_buckets_keep_high_quantiles(self):
+        sketch = core.new_sketch()
+        values = [1.001 ** i for i in range(20000)] + [0.0] * 10
+        for value in values:
+            core.sketch_add(sketch, value)
+        self.assertLessEqual(len(sketch['counts']), core.SKETCH_MAX_BINS)
+        values.sort()
+        exact = values[math.floor(0.9 * len(values))]
+        self.assertLessEqual(abs(core.sketch_quantile(sketch, 0.9) - exact) / exact, core.SKETCH_ACCURACY)
+        self.assertEqual(core.sketch_quantile(sketch, 0.0001), 0.0)
+        self.assertIsNone(core.sketch_quantile(core.new_sketch(), 0.9))
+
+
+class TruncateTest(unittest.TestCase):
+    def test_clusters_are_not_split(self):
+        self.assertEqual(core.truncate('⏱️ 3h', 2), '⏱️…')
+        self.assertEqual(core.truncate('🇩🇪🇫🇷 x', 4), '🇩🇪…')
+        self.assertEqual(core.truncate('👨‍👩‍👧 x', 3), '👨‍👩‍👧…')
+        self.assertEqual(core.truncate('abcdef', 4), 'abc…')
+
+
+if __name__ == '__main__':
+    unittest.main()